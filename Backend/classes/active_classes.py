@@ -0,0 +1,50 @@
+"""
+Cached map of join code -> active class.
+
+Every student joining a session resolves the class by its code, and a
+whole room joins within seconds. Active classes (with their course loaded)
+are cached in a short-lived process-local tier and the shared Django cache;
+the entry is dropped as soon as the class ends, before its code can be
+handed to another class. Misses are never cached, so a new class is
+joinable immediately.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from classpoint_backend.local_cache import LocalTTLCache
+
+
+_config = getattr(settings, 'ACTIVE_CLASS_CACHE', {})
+LOCAL_TTL = _config.get('LOCAL_TTL', 2)
+SHARED_TTL = _config.get('SHARED_TTL', 300)
+MAX_ENTRIES = _config.get('MAX_ENTRIES', 10000)
+
+_classes = LocalTTLCache(ttl=LOCAL_TTL, max_entries=MAX_ENTRIES)
+
+
+def _code_key(code):
+    return f'classes:active-code:{code}'
+
+
+def get_active_class(code):
+    """Return the active class (with course) holding this join code, or None."""
+    code = str(code).strip()
+    classroom = _classes.get(code)
+    if classroom is not None:
+        return classroom
+
+    classroom = cache.get(_code_key(code))
+    if classroom is None:
+        from .models import Class
+        classroom = Class.objects.select_related('course').filter(code=code, active=True).first()
+        if classroom is None:
+            return None
+        cache.set(_code_key(code), classroom, SHARED_TTL)
+
+    _classes.set(code, classroom)
+    return classroom
+
+
+def forget_active_class(code):
+    """Drop a code from both tiers; called when its class ends."""
+    cache.delete(_code_key(code))
+    _classes.delete(code)
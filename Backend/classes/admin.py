@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Class
+from .active_classes import forget_active_class
+from .models import Class, JoinCode
 
 
 @admin.register(Class)
@@ -30,7 +31,15 @@ class ClassAdmin(admin.ModelAdmin):
     
     def deactivate_classes(self, request, queryset):
         """Admin action to deactivate selected classes."""
+        from students.auth_cache import invalidate_class
+
+        deactivated = list(queryset.filter(active=True).values_list('id', 'code'))
         updated = queryset.update(active=False)
+        JoinCode.objects.release([code for _, code in deactivated])
+        for class_id, code in deactivated:
+            forget_active_class(code)
+            # Revoke cached student access, as ending the class does
+            invalidate_class(class_id)
         self.message_user(
             request,
             f'{updated} class(es) were successfully deactivated.'
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:45
+
+from django.conf import settings
+from django.db import migrations, models
+import secrets
+
+
+def reserve_active_codes(apps, schema_editor):
+    """Enter the codes of currently active classes into the pool as in use."""
+    Class = apps.get_model('classes', 'Class')
+    JoinCode = apps.get_model('classes', 'JoinCode')
+    codes = Class.objects.filter(active=True).values_list('code', flat=True)
+    JoinCode.objects.bulk_create(
+        [
+            JoinCode(code=code, length=len(code), in_use=True, shuffle=secrets.randbelow(2 ** 31))
+            for code in codes
+        ],
+        ignore_conflicts=True,
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0004_class_unique_active_class_per_teacher_course'),
+        ('courses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JoinCode',
+            fields=[
+                ('code', models.CharField(max_length=8, primary_key=True, serialize=False)),
+                ('length', models.PositiveSmallIntegerField()),
+                ('in_use', models.BooleanField(default=False)),
+                ('shuffle', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='class',
+            name='code',
+            field=models.CharField(editable=False, max_length=8),
+        ),
+        migrations.AddConstraint(
+            model_name='class',
+            constraint=models.UniqueConstraint(condition=models.Q(('active', True)), fields=('code',), name='unique_active_class_code'),
+        ),
+        migrations.AddIndex(
+            model_name='joincode',
+            index=models.Index(condition=models.Q(('in_use', False)), fields=['length', 'shuffle'], name='joincode_free_idx'),
+        ),
+        migrations.RunPython(reserve_active_codes, migrations.RunPython.noop),
+    ]
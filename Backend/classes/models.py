@@ -1,8 +1,123 @@
-from django.db import models, transaction, IntegrityError
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from courses.models import Course
-import random
+from .active_classes import forget_active_class
+import secrets
+
+
+CLASS_CODE_LENGTH = getattr(settings, 'CLASS_CODE_LENGTH', 4)
+_pool_config = getattr(settings, 'JOIN_CODE_POOL', {})
+REFILL_BATCH = _pool_config.get('REFILL_BATCH', 1000)
+FULL_SEED_LIMIT = _pool_config.get('FULL_SEED_LIMIT', 100000)
+
+
+class JoinCodeExhausted(Exception):
+    """Every join code of the configured length is held by an active class."""
+
+
+class JoinCodeManager(models.Manager):
+    """
+    Allocator for class join codes.
+
+    Free codes sit in the pool in random order; acquiring one takes the head
+    of a partial index (row-locked with SKIP LOCKED, so concurrent class
+    creation never contends on the same code). Codes return to the pool when
+    their class ends.
+    """
+
+    def acquire(self, length=None):
+        """Claim a free code; must run inside the transaction that saves the class."""
+        length = length or CLASS_CODE_LENGTH
+        code = self._claim(length)
+        if code is None and self.reclaim(length):
+            code = self._claim(length)
+        if code is None:
+            self.refill(length)
+            code = self._claim(length)
+        if code is None:
+            raise JoinCodeExhausted(
+                f"All {length}-digit join codes are in use. Increase CLASS_CODE_LENGTH to allow more classes."
+            )
+        return code
+
+    def _claim(self, length):
+        join_code = self.select_for_update(skip_locked=True).filter(
+            length=length, in_use=False
+        ).order_by('shuffle').first()
+        if join_code is None:
+            return None
+        self.filter(pk=join_code.pk).update(in_use=True)
+        return join_code.code
+
+    def release(self, codes):
+        """Return codes to the pool unless an active class still holds them."""
+        return self.filter(code__in=codes, in_use=True).exclude(
+            code__in=Class.objects.filter(code__in=codes, active=True).values('code')
+        ).update(in_use=False, shuffle=secrets.randbelow(2 ** 31))
+
+    def reclaim(self, length):
+        """
+        Release codes of the given length left marked in use by classes
+        ended in bulk. A code is only reclaimed from an ended class that is
+        visible here; rows locked by creations still in flight (whose new
+        class is not visible yet) are skipped rather than freed under them.
+        """
+        reclaimable = self.select_for_update(skip_locked=True).filter(
+            length=length,
+            in_use=True,
+            code__in=Class.objects.filter(active=False).values('code')
+        ).exclude(
+            code__in=Class.objects.filter(active=True).values('code')
+        )
+        codes = list(reclaimable.values_list('code', flat=True))
+        if not codes:
+            return 0
+        return self.filter(code__in=codes, in_use=True).update(in_use=False)
+
+    def refill(self, length):
+        """
+        Add free codes of the given length. Small code spaces are seeded
+        completely; larger ones get a random batch. Existing codes are kept.
+        """
+        low, high = 10 ** (length - 1), 10 ** length
+        if high - low <= FULL_SEED_LIMIT:
+            candidates = range(low, high)
+        else:
+            candidates = {low + secrets.randbelow(high - low) for _ in range(REFILL_BATCH)}
+
+        self.bulk_create(
+            [JoinCode(code=str(value), length=length, shuffle=secrets.randbelow(2 ** 31)) for value in candidates],
+            ignore_conflicts=True,
+            batch_size=1000
+        )
+
+
+class JoinCode(models.Model):
+    """
+    A join code in the allocation pool. A code is in use while an active
+    class holds it; the shuffle key randomizes the order free codes are
+    handed out in.
+    """
+    code = models.CharField(max_length=8, primary_key=True)
+    length = models.PositiveSmallIntegerField()
+    in_use = models.BooleanField(default=False)
+    shuffle = models.PositiveIntegerField()
+
+    objects = JoinCodeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['length', 'shuffle'],
+                condition=models.Q(in_use=False),
+                name='joincode_free_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.code} ({'in use' if self.in_use else 'free'})"
 
 
 class Class(models.Model):
@@ -10,7 +125,7 @@ class Class(models.Model):
     Represents a live session created automatically when a slideshow starts.
     Each Class belongs to a Course and a Teacher.
     """
-    code = models.CharField(max_length=4, unique=True, editable=False)
+    code = models.CharField(max_length=8, editable=False)
     teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_classes')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='classes')
     active = models.BooleanField(default=True)
@@ -22,6 +137,12 @@ class Class(models.Model):
                 fields=['teacher', 'course'],
                 condition=models.Q(active=True),
                 name='unique_active_class_per_teacher_course'
+            ),
+            # Codes are recycled, so only active classes need distinct codes
+            models.UniqueConstraint(
+                fields=['code'],
+                condition=models.Q(active=True),
+                name='unique_active_class_code'
             )
         ]
 
@@ -47,22 +168,15 @@ class Class(models.Model):
         # Validate the model before saving
         self.clean()
         
-        if not self.code:
-            self.code = self.generate_unique_code()
-
-        for attempt in range(5):
-            try:
-                with transaction.atomic():
-                    super().save(*args, **kwargs)
-                break
-            except IntegrityError:
-                self.code = self.generate_unique_code()
-        else:
-            raise IntegrityError("Failed to generate a unique code after several attempts")
-
-    def generate_unique_code(self):
-        """Generate a unique 4-digit join code."""
-        return f"{random.randint(1000, 9999)}"
+        with transaction.atomic():
+            # The code goes back to the pool if the save fails
+            if not self.code:
+                self.code = JoinCode.objects.acquire()
+            super().save(*args, **kwargs)
+            if not self.active:
+                JoinCode.objects.release([self.code])
+                code = self.code
+                transaction.on_commit(lambda: forget_active_class(code))
 
     def __str__(self):
         status = "Active" if self.active else "Inactive"
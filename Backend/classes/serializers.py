@@ -29,10 +29,17 @@ class ClassSerializer(serializers.ModelSerializer):
 
     def get_enrollment_count(self, obj):
         """Get the number of students enrolled in this class."""
+        # Annotated by ClassViewSet; fall back to a query for single instances
+        annotated = getattr(obj, 'enrollment_count', None)
+        if annotated is not None:
+            return annotated
         return StudentClassEnrollment.objects.filter(classroom=obj).count()
 
     def get_student_count(self, obj):
         """Get the number of unique students enrolled in this class."""
+        annotated = getattr(obj, 'student_count', None)
+        if annotated is not None:
+            return annotated
         return StudentClassEnrollment.objects.filter(classroom=obj).values('student').distinct().count()
     
     def validate(self, data):
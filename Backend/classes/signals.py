@@ -0,0 +1,16 @@
+"""
+Return join codes to the pool when classes are deleted.
+
+Ending a class releases its code in Class.save (or the admin's bulk end
+action); a deleted class, including one removed with its course or teacher,
+releases it here, in the deleting transaction.
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Class, JoinCode
+
+
+@receiver(post_delete, sender=Class)
+def release_join_code(sender, instance, **kwargs):
+    if instance.code:
+        JoinCode.objects.release([instance.code])
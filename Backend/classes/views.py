@@ -1,10 +1,14 @@
 from rest_framework import viewsets, permissions, serializers
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Class
+from rest_framework.pagination import CursorPagination
+from django.contrib.auth.models import User
+from django.db.models import Count
+from .models import Class, JoinCodeExhausted
 from courses.models import Course
 from .serializers import ClassSerializer
+from classpoint_backend.db_router import ReplicaReadsMixin
 
 
 class CreateClassFromPowerPointSerializer(serializers.Serializer):
@@ -15,17 +19,45 @@ class EndClassSerializer(serializers.Serializer):
     active = serializers.BooleanField(help_text="Set to false to end the class session.")
 
 
-class ClassViewSet(viewsets.ReadOnlyModelViewSet):
+class ClassCursorPagination(CursorPagination):
+    """Stable newest-first pages for a teacher's (possibly long) class history."""
+    ordering = '-created_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class ClassViewSet(ReplicaReadsMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing and retrieving classes.
     Teachers can only see their own classes.
+    Lists and statistics read from the replica when one is configured.
     """
     serializer_class = ClassSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ClassCursorPagination
+    replica_actions = ('list', 'statistics')
 
     def get_queryset(self):
         """Only show classes created by the authenticated teacher."""
-        return Class.objects.filter(teacher=self.request.user).order_by('-created_at')
+        # Student tokens authenticate a StudentUser: no class is theirs to manage
+        if not isinstance(self.request.user, User):
+            return Class.objects.none()
+        # Counts are annotated so serializing a page costs one query, not two per class
+        return Class.objects.filter(teacher=self.request.user).select_related(
+            'course', 'teacher'
+        ).annotate(
+            enrollment_count=Count('enrollments'),
+            student_count=Count('enrollments__student', distinct=True),
+        ).order_by('-created_at')
+
+    @action(detail=True, methods=['get'])
+    def statistics(self, request, pk=None):
+        """Score statistics for this class's students across the course's quizzes (cached)."""
+        from quizzes.statistics import class_statistics
+
+        classroom = self.get_object()
+        return Response({'class_id': classroom.id, **class_statistics(classroom)})
 
 
 @api_view(['POST'])
@@ -41,6 +73,7 @@ def create_class_from_powerpoint(request):
         - 201: Class created successfully with join code
         - 400: Missing or invalid course_id
         - 404: Course not found
+        - 503: No free join codes left
     """
     course_id = request.data.get('course_id') or request.query_params.get('course_id')
 
@@ -58,7 +91,10 @@ def create_class_from_powerpoint(request):
             status=status.HTTP_404_NOT_FOUND
         )
 
-    new_class = Class.objects.create(course=course, teacher=request.user, active=True)
+    try:
+        new_class = Class.objects.create(course=course, teacher=request.user, active=True)
+    except JoinCodeExhausted as e:
+        return Response({"detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     serializer = ClassSerializer(new_class)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -99,5 +135,9 @@ def end_class(request, class_id):
     class_obj.active = False
     class_obj.save()
 
+    # Revoke cached student access for this class
+    from students.auth_cache import invalidate_class
+    invalidate_class(class_obj.id)
+
     serializer = ClassSerializer(class_obj)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -3,6 +3,10 @@ ASGI config for classpoint_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live result streams under /api/live/ are long-lived Server-Sent Events
+responses and need this ASGI application (e.g. ``uvicorn
+classpoint_backend.asgi:application``); under WSGI they cannot stream.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,95 @@
+"""
+In-process micro-batching queue.
+
+Items are put on a queue and handed to a handler in batches, either by a
+lazily started background thread or synchronously via flush(). Used by the
+answer ingestion and grading pipelines so request handlers only pay for a
+queue put.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BatchQueue:
+    """
+    Collects items and calls handler(batch) with up to batch_size items.
+    After the first item arrives the queue waits at most flush_interval
+    seconds for more before handing the batch over.
+    """
+
+    def __init__(self, handler, batch_size=200, flush_interval=0.05,
+                 run_in_background=True, name='batch-queue'):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.run_in_background = run_in_background
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def put(self, item):
+        """Queue an item; processes it immediately when not running in background."""
+        self._queue.put(item)
+        if self.run_in_background:
+            self._ensure_thread()
+        else:
+            self.flush()
+
+    def flush(self):
+        """Drain and process everything currently queued on the calling thread."""
+        with self._flush_lock:
+            while True:
+                batch = self._drain(block=False)
+                if not batch:
+                    return
+                self._handle(batch)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._drain(block=True)
+            if batch:
+                with self._flush_lock:
+                    self._handle(batch)
+
+    def _drain(self, block):
+        batch = []
+        try:
+            batch.append(self._queue.get(block=block, timeout=1.0 if block else None))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and block:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _handle(self, batch):
+        close_old_connections()
+        try:
+            self.handler(batch)
+        except Exception:
+            logger.exception('%s failed to process a batch of %d item(s)', self.name, len(batch))
@@ -0,0 +1,131 @@
+"""
+Read-replica routing for reporting endpoints.
+
+Teacher reporting (class lists, submission lists, statistics) only reads,
+yet it shares DATABASES['default'] with live student writes. When a replica
+alias is configured (see REPLICA_DATABASE_URL in settings), views using
+ReplicaReadsMixin mark their safe reporting actions, and ReplicaRouter sends
+the reads of those requests to the replica. Everything else, every write and
+every read inside a transaction stays on the primary.
+
+Replicas lag behind the primary. ReplicaPinningMiddleware notes when a
+request wrote and pins its user to the primary for PIN_SECONDS afterwards
+(a shared cache key), so teachers always see their own changes.
+"""
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_config = getattr(settings, 'REPLICA_ROUTING', {})
+REPLICA_ALIAS = _config.get('ALIAS', 'replica')
+PIN_SECONDS = _config.get('PIN_SECONDS', 5)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class RequestRouting:
+    """Routing state of the current request."""
+
+    __slots__ = ('reporting', 'wrote')
+
+    def __init__(self):
+        self.reporting = False
+        self.wrote = False
+
+
+_routing = ContextVar('classpoint_request_routing', default=None)
+
+
+def _pin_key(user):
+    return f'db:primary-pin:{type(user).__name__}:{user.id}'
+
+
+def is_pinned(user):
+    """True while a user's recent write may not have reached the replica yet."""
+    return bool(getattr(user, 'is_authenticated', False) and cache.get(_pin_key(user)))
+
+
+def pin_to_primary(user):
+    cache.set(_pin_key(user), 1, PIN_SECONDS)
+
+
+def reading_from_replica():
+    """True when reads of the current request go to the replica."""
+    state = _routing.get()
+    return state is not None and state.reporting
+
+
+class ReplicaRouter:
+    """Sends reads of reporting requests to the replica; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.reporting:
+            return None
+        # Reads inside a transaction must see its own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        return db != REPLICA_ALIAS
+
+
+def ReplicaPinningMiddleware(get_response):
+    """
+    Tracks routing state per request and pins users who wrote to the
+    primary. Not installed when no replica is configured.
+    """
+    if not replica_configured():
+        raise MiddlewareNotUsed
+
+    def middleware(request):
+        token = _routing.set(RequestRouting())
+        try:
+            response = get_response(request)
+            if _routing.get().wrote:
+                # DRF stores the authenticated user back on the Django request
+                user = getattr(request, 'user', None)
+                if getattr(user, 'is_authenticated', False):
+                    pin_to_primary(user)
+            return response
+        finally:
+            _routing.reset(token)
+
+    return middleware
+
+
+class ReplicaReadsMixin:
+    """
+    DRF view mixin: safe requests to the actions in replica_actions read from
+    the replica unless the user is pinned to the primary.
+    """
+    replica_actions = ('list',)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _routing.get()
+        if (
+            state is not None
+            and request.method in SAFE_METHODS
+            and getattr(self, 'action', None) in self.replica_actions
+            and not is_pinned(request.user)
+        ):
+            state.reporting = True
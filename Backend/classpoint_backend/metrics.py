@@ -0,0 +1,194 @@
+"""
+In-process request metrics exposed in Prometheus text format.
+
+MetricsMiddleware records, per route (the URL pattern, not the raw path):
+
+- request latency,
+- the number of DB queries and the time spent in them,
+- response size,
+
+into fixed-bucket histograms held in memory. Each observation is a bisect
+and a few additions under a lock, so the middleware is cheap enough to
+leave on in production. GET /metrics renders the current values; every
+worker process keeps its own registry, so scrape each worker (or sum in
+Prometheus).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+
+
+_config = getattr(settings, 'METRICS', {})
+ENABLED = _config.get('ENABLED', True)
+TOKEN = _config.get('TOKEN')
+METRICS_PATH = '/metrics'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        # bisect_left puts a value equal to a bound into that bound's bucket (le)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            base = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = f'{base},' if base else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """The histograms recorded for every request."""
+
+    def __init__(self):
+        self.latency = Histogram(
+            'classpoint_http_request_duration_seconds', 'Request latency in seconds.',
+            ('method', 'route', 'status'), LATENCY_BUCKETS
+        )
+        self.db_queries = Histogram(
+            'classpoint_http_db_queries', 'Database queries per request.',
+            ('method', 'route'), QUERY_COUNT_BUCKETS
+        )
+        self.db_time = Histogram(
+            'classpoint_http_db_query_duration_seconds', 'Time spent in database queries per request.',
+            ('method', 'route'), QUERY_TIME_BUCKETS
+        )
+        self.response_size = Histogram(
+            'classpoint_http_response_size_bytes', 'Response body size in bytes (streaming responses excluded).',
+            ('method', 'route'), SIZE_BUCKETS
+        )
+        self.histograms = (self.latency, self.db_queries, self.db_time, self.response_size)
+
+    def record(self, request, response, seconds, queries=None):
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None and match.route else '<unmatched>'
+        method = request.method
+
+        self.latency.observe((method, route, str(response.status_code)), seconds)
+        if queries is not None:
+            self.db_queries.observe((method, route), queries.count)
+            self.db_time.observe((method, route), queries.seconds)
+        if not getattr(response, 'streaming', False):
+            self.response_size.observe((method, route), len(response.content))
+
+    def render(self):
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for histogram in self.histograms:
+            histogram.clear()
+
+
+registry = MetricsRegistry()
+
+
+class QueryTracker:
+    """Counts and times the queries run on this thread's DB connections."""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+    def install(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """
+    Records latency, DB queries and response size for every request.
+    DB queries are tracked for sync views only: async views run their
+    queries on other threads.
+    """
+    if not ENABLED:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if request.path == METRICS_PATH:
+                return await get_response(request)
+            start = time.perf_counter()
+            response = await get_response(request)
+            registry.record(request, response, time.perf_counter() - start)
+            return response
+    else:
+        def middleware(request):
+            if request.path == METRICS_PATH:
+                return get_response(request)
+            queries = QueryTracker()
+            start = time.perf_counter()
+            with queries.install():
+                response = get_response(request)
+            registry.record(request, response, time.perf_counter() - start, queries)
+            return response
+
+    return middleware
+
+
+def metrics_view(request):
+    """Prometheus text exposition of this process's request metrics."""
+    if TOKEN and request.headers.get('Authorization') != f'Bearer {TOKEN}':
+        return HttpResponseForbidden('Metrics token required.\n', content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
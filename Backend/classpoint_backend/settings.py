@@ -49,11 +49,13 @@ INSTALLED_APPS = [
     'classes',
     'courses',
     'students',
-    'quizzes'
+    'quizzes',
+    'live',
 ]
 
 
 MIDDLEWARE = [
+    'classpoint_backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'classpoint_backend.db_router.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'classpoint_backend.urls'
@@ -84,6 +87,14 @@ SIMPLE_JWT = {
     # Keep refresh lifetime default or adjust as needed
 }
 
+# Student token authentication caches (seconds / entries)
+# LOCAL_TTL bounds how long another worker may keep serving a just-ended class
+STUDENT_AUTH_CACHE = {
+    'LOCAL_TTL': int(os.getenv('STUDENT_AUTH_LOCAL_TTL', '5')),
+    'SHARED_TTL': int(os.getenv('STUDENT_AUTH_SHARED_TTL', '300')),
+    'MAX_ENTRIES': 10000,
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -124,12 +135,60 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Take the write lock at BEGIN so concurrent writers wait for the
+            # busy timeout instead of failing with "database is locked"
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
         }
     }
 # Override with DATABASE_URL if provided (useful for Docker and deployment)
 if 'DATABASE_URL' in os.environ:
     DATABASES['default'] = dj_database_url.config(conn_max_age=600)
 
+# Optional read replica for reporting endpoints (classpoint_backend.db_router).
+# Locally, point it at the primary's file to exercise the routing with two
+# aliases: REPLICA_DATABASE_URL=sqlite:///db.sqlite3
+if os.getenv('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = dj_database_url.parse(os.environ['REPLICA_DATABASE_URL'], conn_max_age=600)
+    # Tests read the replica through the test primary
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['classpoint_backend.db_router.ReplicaRouter']
+REPLICA_ROUTING = {
+    'ALIAS': 'replica',
+    'PIN_SECONDS': int(os.getenv('REPLICA_PIN_SECONDS', '5')),  # primary-only window after a user writes
+}
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default (per process). Versioned keys are only shared
+# between workers through a shared backend: set CACHE_BACKEND to "file"
+# (CACHE_LOCATION is a directory), "memcached" or "redis" (CACHE_LOCATION is
+# host:port, a unix:/path socket or a redis:// URL)
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem').lower()
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'classpoint',
+    'file': str(BASE_DIR / '.cache'),
+    'memcached': '127.0.0.1:11211',
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'classpoint'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 20000} if CACHE_BACKEND in ('locmem', 'file') else {},
+    }
+}
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'ClassPoint API',
     'DESCRIPTION': 'Backend API for ClassPoint Platform',
@@ -149,6 +208,111 @@ SPECTACULAR_SETTINGS = {
 }
 
 
+# Class join codes: numeric, CLASS_CODE_LENGTH digits (4-8), allocated from a
+# pool of free codes and recycled when classes end
+CLASS_CODE_LENGTH = int(os.getenv('CLASS_CODE_LENGTH', '4'))
+JOIN_CODE_POOL = {
+    'REFILL_BATCH': 1000,  # random codes added per refill for long codes
+    'FULL_SEED_LIMIT': 100000,  # code spaces up to this size are seeded completely
+}
+
+# Join code -> active class map used by the student join endpoint (seconds / entries)
+ACTIVE_CLASS_CACHE = {
+    'LOCAL_TTL': 2,
+    'SHARED_TTL': 300,
+    'MAX_ENTRIES': 10000,
+}
+
+# Per-route request metrics served at /metrics (Prometheus text format)
+# Set METRICS_TOKEN to require "Authorization: Bearer <token>" when scraping
+METRICS = {
+    'ENABLED': os.getenv('METRICS_ENABLED', 'True').lower() in ('true', '1', 'yes'),
+    'TOKEN': os.getenv('METRICS_TOKEN'),
+}
+
+# Serialized quiz content for the quiz read endpoints (versioned keys, seconds)
+QUIZ_CONTENT_CACHE = {
+    'ALIAS': 'default',
+    'TTL': 3600,
+}
+
+# Answer uploads (image upload / drawing), checked while they stream in
+# TEMP_DIR must be on the MEDIA_ROOT filesystem so saving an upload is a rename
+UPLOADS = {
+    'MAX_BYTES': int(os.getenv('UPLOAD_MAX_MB', '20')) * 1024 * 1024,  # when the quiz is not known upfront
+    'TEMP_DIR': BASE_DIR / 'media' / '.incoming',
+}
+
+# Thumbnails / previews of uploaded answers, rendered on a process pool
+# (students.derivatives); VARIANTS maps thumb / preview to their longest side in px
+ANSWER_DERIVATIVES = {
+    'VARIANTS': {'thumb': 320, 'preview': 1280},
+    'FORMAT': os.getenv('ANSWER_DERIVATIVE_FORMAT', 'WEBP'),  # WEBP or JPEG
+    'QUALITY': 80,
+    'WORKERS': int(os.getenv('ANSWER_DERIVATIVE_WORKERS', '2')),  # 0 renders on the collector thread
+    'BATCH_SIZE': 50,
+    'FLUSH_INTERVAL': 0.5,
+    'ASYNC': os.getenv('ANSWER_DERIVATIVES_ASYNC', 'True').lower() in ('true', '1', 'yes'),
+}
+
+# Drawing answers sent as vector strokes (students.strokes), base64 in the
+# "strokes" field; rasterized to PNG on demand and kept under derivatives/strokes/
+DRAWING_STROKES = {
+    'MAX_BYTES': 512 * 1024,  # decoded payload
+    'MAX_STROKES': 5000,
+    'MAX_POINTS': 50000,
+    # Bounds on rasterizing cost: pen width in px, and the painted area
+    # estimated from widths and path lengths, in canvas areas
+    'MAX_WIDTH': 64,
+    'MAX_INK': 20,
+}
+
+# Answer files served by GET /api/students/answers/<id>/file/ (students.media).
+# SENDFILE hands the transfer to the web server after the access check:
+# "x-accel-redirect" (nginx: an internal location at ACCEL_PREFIX aliased to
+# MEDIA_ROOT) or "x-sendfile" (Apache mod_xsendfile, lighttpd); empty streams
+# the file from Django. Serialized URLs are signed and valid for URL_TTL to
+# 2 x URL_TTL seconds, so <img> tags can load them without a token
+PROTECTED_MEDIA = {
+    'SENDFILE': os.getenv('MEDIA_SENDFILE', '').lower(),
+    'ACCEL_PREFIX': os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/'),
+    'URL_TTL': int(os.getenv('MEDIA_URL_TTL', str(6 * 3600))),
+    'MAX_AGE': 365 * 24 * 3600,  # browser cache lifetime of the (immutable) files
+}
+
+# Batched answer ingestion (POST /api/students/answers/submit/)
+ANSWER_INGESTION = {
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 0.05,  # seconds to wait for more answers before flushing
+    'RECEIPT_TTL': 3600,
+    'ASYNC': os.getenv('ANSWER_INGESTION_ASYNC', 'True').lower() in ('true', '1', 'yes'),
+}
+
+# Background grading of multiple choice / short answer submissions
+GRADING = {
+    'WORKERS': int(os.getenv('GRADING_WORKERS', '2')),
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.2,
+    'ASYNC': os.getenv('GRADING_ASYNC', 'True').lower() in ('true', '1', 'yes'),
+}
+
+# Cached quiz / class statistics (dropped early when new grades arrive)
+STATISTICS_CACHE_TTL = 300
+REPLICA_STATISTICS_CACHE_TTL = 15  # when computed on the (lagging) replica
+
+# Compiled per-quiz validation / grading rules (process-local LRU)
+QUIZ_RULES_CACHE = {
+    'TTL': 3600,
+    'MAX_ENTRIES': int(os.getenv('QUIZ_RULES_CACHE_SIZE', '1024')),
+}
+
+# Live result streaming (Server-Sent Events)
+# Swap the backend for a shared broker when running more than one ASGI worker
+LIVE_PUBSUB_BACKEND = os.getenv('LIVE_PUBSUB_BACKEND', 'live.pubsub.InProcessPubSub')
+LIVE_PUBSUB_OPTIONS = {'max_queue_size': 256}
+LIVE_STREAM_HEARTBEAT_SECONDS = 15
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -189,6 +353,17 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Student answer uploads are stored once per distinct content, named by
+# SHA-256 under SHARD_DEPTH levels of SHARD_WIDTH-character directories
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'answer_uploads': {
+        'BACKEND': 'students.storage.ContentAddressedStorage',
+        'OPTIONS': {'shard_depth': 2, 'shard_width': 2},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
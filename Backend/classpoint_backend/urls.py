@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import metrics_view
 
 urlpatterns = [
     # Admin
@@ -29,6 +30,10 @@ urlpatterns = [
     path('api/courses/', include('courses.urls')),
     path('api/quizzes/', include('quizzes.urls')),
     path('api/students/', include('students.urls')),
+    path('api/live/', include('live.urls')),
+
+    # Prometheus scrape endpoint (per-route latency, DB queries, response sizes)
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import QuizAggregate, WordFrequency
+
+
+@admin.register(QuizAggregate)
+class QuizAggregateAdmin(admin.ModelAdmin):
+    list_display = ['id', 'quiz', 'total', 'correct_count', 'version', 'updated_at']
+    list_filter = ['quiz__quiz_type']
+    search_fields = ['quiz__title', 'quiz__course__name']
+    readonly_fields = ['updated_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('quiz')
+
+
+@admin.register(WordFrequency)
+class WordFrequencyAdmin(admin.ModelAdmin):
+    list_display = ['id', 'quiz', 'word', 'count']
+    search_fields = ['word', 'quiz__title']
+    ordering = ['quiz', '-count']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('quiz')
@@ -0,0 +1,173 @@
+"""
+Incremental live aggregation of quiz answers.
+
+Each insert path calls record_answers() inside the transaction that creates
+the answers, so the aggregate row always agrees with the committed answers.
+rebuild_quiz_aggregate() recomputes everything from the raw rows.
+"""
+from collections import Counter
+from django.db import transaction
+from quizzes.constants import QuizTypeCodes
+from quizzes.helpers import QuizGradingHelper
+from quizzes.rules import get_quiz_rules
+from .models import QuizAggregate, WordFrequency
+
+
+AGGREGATED_QUIZ_TYPES = (QuizTypeCodes.MULTIPLE_CHOICE, QuizTypeCodes.WORD_CLOUD)
+MAX_WORD_LENGTH = WordFrequency._meta.get_field('word').max_length
+
+
+def _apply_multiple_choice(aggregate, quiz, answers):
+    # Reuse the grading rules so live tallies agree with submission scores
+    rules = get_quiz_rules(quiz)
+
+    counts = list(aggregate.choice_counts or [])
+    if len(counts) < rules.choice_count:
+        counts.extend([0] * (rules.choice_count - len(counts)))
+
+    for answer in answers:
+        selected = (answer.answer_data or {}).get('selected_choice_indices', [])
+        for index in selected:
+            if 0 <= index < len(counts):
+                counts[index] += 1
+        aggregate.total += 1
+        if QuizGradingHelper.grade_multiple_choice_indices(selected, rules.correct_indices, rules.allow_multiple)['is_correct']:
+            aggregate.correct_count += 1
+
+    aggregate.choice_counts = counts
+
+
+def normalize_words(quiz, words):
+    """
+    Normalize a student's words for the frequency index.
+    Honors the quiz's normalize_case (default on) and allow_duplicates
+    properties: without duplicates, a word counts once per answer.
+    """
+    rules = get_quiz_rules(quiz)
+
+    normalized = []
+    for word in words:
+        word = ' '.join(str(word).split())[:MAX_WORD_LENGTH]
+        if not word:
+            continue
+        normalized.append(word.lower() if rules.normalize_case else word)
+
+    if not rules.allow_duplicates:
+        normalized = list(dict.fromkeys(normalized))
+    return normalized
+
+
+def _apply_word_cloud(aggregate, quiz, answers):
+    increments = Counter()
+    for answer in answers:
+        increments.update(normalize_words(quiz, (answer.answer_data or {}).get('words', [])))
+        aggregate.total += 1
+
+    if not increments:
+        return
+
+    existing = {
+        row.word: row
+        for row in WordFrequency.objects.filter(quiz=quiz, word__in=list(increments))
+    }
+    to_update, to_create = [], []
+    for word, count in increments.items():
+        row = existing.get(word)
+        if row is not None:
+            row.count += count
+            to_update.append(row)
+        else:
+            to_create.append(WordFrequency(quiz=quiz, word=word, count=count))
+
+    if to_update:
+        WordFrequency.objects.bulk_update(to_update, ['count'])
+    if to_create:
+        WordFrequency.objects.bulk_create(to_create)
+
+
+def _apply(aggregate, quiz, answers):
+    if quiz.quiz_type == QuizTypeCodes.MULTIPLE_CHOICE:
+        _apply_multiple_choice(aggregate, quiz, answers)
+    elif quiz.quiz_type == QuizTypeCodes.WORD_CLOUD:
+        _apply_word_cloud(aggregate, quiz, answers)
+
+
+def record_answers(quiz, answers):
+    """
+    Fold newly created answers for one quiz into its aggregate.
+    The aggregate row is locked for the duration of the caller's transaction
+    so concurrent submissions are applied one after another.
+    """
+    if quiz.quiz_type not in AGGREGATED_QUIZ_TYPES or not answers:
+        return None
+
+    # Runs inside the caller's transaction; no savepoint needed
+    with transaction.atomic(savepoint=False):
+        aggregate, _ = QuizAggregate.objects.select_for_update().get_or_create(quiz=quiz)
+        _apply(aggregate, quiz, answers)
+        aggregate.version += 1
+        aggregate.save()
+    return aggregate
+
+
+def rebuild_quiz_aggregate(quiz):
+    """Recompute a quiz's aggregate from its stored answers."""
+    from students.models import StudentAnswer
+
+    answers = StudentAnswer.objects.filter(submission__quiz=quiz).only('id', 'answer_data')
+    with transaction.atomic():
+        aggregate, _ = QuizAggregate.objects.select_for_update().get_or_create(quiz=quiz)
+        aggregate.total = 0
+        aggregate.correct_count = 0
+        aggregate.choice_counts = []
+        WordFrequency.objects.filter(quiz=quiz).delete()
+        # Word clouds are folded in one pass, so materialize the answers once
+        _apply(aggregate, quiz, list(answers))
+        aggregate.version += 1
+        aggregate.save()
+    return aggregate
+
+
+def multiple_choice_results(quiz):
+    """Return the live multiple choice tally for a quiz (O(choices))."""
+    aggregate = QuizAggregate.objects.filter(quiz=quiz).first()
+    choices = (quiz.properties or {}).get('choices', [])
+    counts = list(aggregate.choice_counts) if aggregate else []
+    counts.extend([0] * (len(choices) - len(counts)))
+
+    return {
+        'quiz_id': quiz.id,
+        'quiz_type': quiz.quiz_type,
+        'total': aggregate.total if aggregate else 0,
+        'correct_count': aggregate.correct_count if aggregate else 0,
+        'choices': [
+            {
+                'index': i,
+                'text': choice.get('text', ''),
+                'is_correct': bool(choice.get('is_correct', False)),
+                'count': counts[i],
+            }
+            for i, choice in enumerate(choices)
+        ],
+        'version': aggregate.version if aggregate else 0,
+        'updated_at': aggregate.updated_at if aggregate else None,
+    }
+
+
+def word_cloud_version(quiz):
+    """Return the current aggregate version for a quiz (0 before any answer)."""
+    return QuizAggregate.objects.filter(quiz=quiz).values_list('version', flat=True).first() or 0
+
+
+def word_cloud_results(quiz, top=50):
+    """Return the top-N words for a word cloud quiz."""
+    aggregate = QuizAggregate.objects.filter(quiz=quiz).first()
+    words = WordFrequency.objects.filter(quiz=quiz).order_by('-count', 'word')[:top]
+    return {
+        'quiz_id': quiz.id,
+        'quiz_type': quiz.quiz_type,
+        'total': aggregate.total if aggregate else 0,
+        'words': [{'word': row.word, 'count': row.count} for row in words],
+        'version': aggregate.version if aggregate else 0,
+        'updated_at': aggregate.updated_at if aggregate else None,
+    }
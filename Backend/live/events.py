@@ -0,0 +1,39 @@
+"""
+Live events published when students interact with a running class.
+"""
+from django.db import transaction
+from .pubsub import get_pubsub, class_channel, quiz_channel
+
+
+def answer_created_message(answer, quiz, student):
+    """Build the event payload for a newly created StudentAnswer."""
+    return {
+        'event': 'answer.created',
+        'answer': {
+            'id': answer.id,
+            'quiz_id': quiz.id,
+            'quiz_type': quiz.quiz_type,
+            'student_id': student.id,
+            'student_name': student.full_name,
+            'answer_data': answer.answer_data,
+            'has_file': bool(answer.uploaded_file),
+            'submitted_at': answer.submitted_at.isoformat() if answer.submitted_at else None,
+        },
+    }
+
+
+def publish_answer_created(answer, quiz, student, classroom_id=None):
+    """
+    Broadcast a new answer to its quiz channel and, when known, the class channel.
+    Publishing waits for the surrounding transaction to commit so subscribers
+    never see answers that were rolled back.
+    """
+    message = answer_created_message(answer, quiz, student)
+
+    def _publish():
+        pubsub = get_pubsub()
+        pubsub.publish(quiz_channel(quiz.id), message)
+        if classroom_id is not None:
+            pubsub.publish(class_channel(classroom_id), message)
+
+    transaction.on_commit(_publish)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from quizzes.models import Quiz
+from live.aggregation import rebuild_quiz_aggregate
+
+
+class Command(BaseCommand):
+    help = 'Rebuild live quiz aggregates from the stored student answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quiz',
+            type=int,
+            action='append',
+            dest='quiz_ids',
+            help='Quiz ID to rebuild (repeatable; default: all quizzes)'
+        )
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all().order_by('id')
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(id__in=options['quiz_ids'])
+
+        rebuilt = 0
+        for quiz in quizzes.iterator():
+            aggregate = rebuild_quiz_aggregate(quiz)
+            rebuilt += 1
+            self.stdout.write(f"  - {quiz.title} (#{quiz.id}): {aggregate.total} answers")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {rebuilt} quiz aggregate(s)'))
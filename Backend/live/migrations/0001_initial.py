@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('quizzes', '0005_quiz_multi_question_id_quiz_question_order_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('choice_counts', models.JSONField(blank=True, default=list)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='aggregate', to='quizzes.quiz')),
+            ],
+        ),
+    ]
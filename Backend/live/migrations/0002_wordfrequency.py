@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0001_initial'),
+        ('quizzes', '0005_quiz_multi_question_id_quiz_question_order_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordFrequency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_frequencies', to='quizzes.quiz')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['quiz', '-count'], name='wordfreq_quiz_count_idx')],
+                'constraints': [models.UniqueConstraint(fields=('quiz', 'word'), name='unique_word_per_quiz')],
+            },
+        ),
+    ]
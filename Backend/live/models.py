@@ -0,0 +1,42 @@
+from django.db import models
+from quizzes.models import Quiz
+
+
+class QuizAggregate(models.Model):
+    """
+    Running totals for one quiz, maintained incrementally as answers arrive.
+    Lets the presenter's results window read O(choices) data instead of
+    recounting every StudentAnswer.
+    """
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name='aggregate')
+    total = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    # Multiple choice: one counter per choice index, in properties['choices'] order
+    choice_counts = models.JSONField(default=list, blank=True)
+    # Bumped on every change; clients use it to detect fresh results
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Aggregate for {self.quiz.title} ({self.total} answers)"
+
+
+class WordFrequency(models.Model):
+    """
+    Normalized word counts for a word cloud quiz.
+    Updated under the QuizAggregate row lock, so increments never race.
+    """
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='word_frequencies')
+    word = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'word'], name='unique_word_per_quiz')
+        ]
+        indexes = [
+            models.Index(fields=['quiz', '-count'], name='wordfreq_quiz_count_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.word} × {self.count}"
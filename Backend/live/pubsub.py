@@ -0,0 +1,118 @@
+"""
+Publish/subscribe backends for live result streaming.
+
+Publishers are ordinary (synchronous) request handlers; subscribers are
+async streaming responses running on the ASGI event loop. The backend is
+selected with the LIVE_PUBSUB_BACKEND setting so the in-process default can
+be swapped for a broker-backed implementation when running several workers.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BasePubSub:
+    """Interface every pub/sub backend implements."""
+
+    def publish(self, channel, message):
+        """Deliver message (a JSON-serializable dict) to every subscriber of channel."""
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Return a Subscription for channel. Must be called on the event loop."""
+        raise NotImplementedError
+
+
+class Subscription:
+    """
+    A single subscriber's bounded message queue.
+    When a slow client falls behind, the oldest undelivered message is dropped.
+    """
+
+    def __init__(self, pubsub, channel, max_queue_size):
+        self.pubsub = pubsub
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+
+    def deliver(self, message):
+        """Thread-safe hand-off of a message onto the subscriber's loop."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Event loop already closed: the client is gone
+            self.close()
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Wait for the next message; raises asyncio.TimeoutError after timeout seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.pubsub.unsubscribe(self)
+
+
+class InProcessPubSub(BasePubSub):
+    """
+    Pub/sub within a single Python process.
+    Suitable for one ASGI worker; use a shared backend for several workers.
+    """
+
+    def __init__(self, max_queue_size=256):
+        self.max_queue_size = max_queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_pubsub():
+    """Return the process-wide pub/sub backend configured in settings."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'LIVE_PUBSUB_BACKEND', 'live.pubsub.InProcessPubSub')
+                options = getattr(settings, 'LIVE_PUBSUB_OPTIONS', {})
+                _backend = import_string(path)(**options)
+    return _backend
+
+
+def class_channel(class_id):
+    return f'class:{class_id}'
+
+
+def quiz_channel(quiz_id):
+    return f'quiz:{quiz_id}'
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import class_stream, quiz_stream
+
+urlpatterns = [
+    # Server-Sent Events streams (require an ASGI server)
+    path('classes/<int:class_id>/stream/', class_stream, name='live_class_stream'),
+    path('quizzes/<int:quiz_id>/stream/', quiz_stream, name='live_quiz_stream'),
+]
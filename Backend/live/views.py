@@ -0,0 +1,119 @@
+"""
+Server-Sent Events endpoints that push live quiz results.
+
+These are plain async Django views (not DRF) because a stream stays open
+for the whole session; they must be served by an ASGI server. Browsers'
+EventSource cannot set headers, so the Bearer token may also be passed as
+a ``?token=`` query parameter.
+"""
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from classes.models import Class
+from quizzes.models import Quiz
+from students.authentication import StudentAuthentication, StudentUser
+from .pubsub import get_pubsub, class_channel, quiz_channel
+
+
+HEARTBEAT_SECONDS = getattr(settings, 'LIVE_STREAM_HEARTBEAT_SECONDS', 15)
+
+
+def _authenticate(request):
+    """Resolve the request's student or teacher user, or None."""
+    token = request.GET.get('token')
+    if token and not request.META.get('HTTP_AUTHORIZATION'):
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    result = StudentAuthentication().authenticate(request)
+    if result is None:
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            result = None
+    return result[0] if result else None
+
+
+def _authorize_class(request, class_id):
+    """Only the teacher running the class may follow its stream."""
+    user = _authenticate(request)
+    if user is None or isinstance(user, StudentUser):
+        return False
+    return Class.objects.filter(id=class_id, teacher=user).exists()
+
+
+def _authorize_quiz(request, quiz_id):
+    """
+    Teachers may follow their own quizzes. Students may follow a quiz from
+    their class's course when results are shown to students.
+    Returns (allowed, is_student).
+    """
+    user = _authenticate(request)
+    if user is None:
+        return False, False
+
+    if isinstance(user, StudentUser):
+        allowed = Quiz.objects.filter(
+            id=quiz_id,
+            course_id=user.classroom.course_id,
+            show_results_to_students=True
+        ).exists()
+        return allowed, True
+
+    allowed = Quiz.objects.filter(id=quiz_id, course__teacher=user).exists()
+    return allowed, False
+
+
+def _anonymize(message):
+    """Strip student identity from an event before sending it to students."""
+    answer = dict(message.get('answer', {}))
+    answer.pop('student_id', None)
+    answer.pop('student_name', None)
+    return {**message, 'answer': answer}
+
+
+async def _event_stream(channel, transform=None):
+    """Yield SSE frames for every message published on channel."""
+    subscription = get_pubsub().subscribe(channel)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                message = await subscription.get(timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if transform is not None:
+                message = transform(message)
+            data = json.dumps(message, cls=DjangoJSONEncoder)
+            yield f"event: {message['event']}\ndata: {data}\n\n"
+    finally:
+        subscription.close()
+
+
+def _sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def class_stream(request, class_id):
+    """Stream every new answer submitted in a live class."""
+    if not await sync_to_async(_authorize_class)(request, class_id):
+        return JsonResponse({'detail': 'Class not found.'}, status=404)
+    return _sse_response(_event_stream(class_channel(class_id)))
+
+
+async def quiz_stream(request, quiz_id):
+    """Stream every new answer submitted for a quiz."""
+    allowed, is_student = await sync_to_async(_authorize_quiz)(request, quiz_id)
+    if not allowed:
+        return JsonResponse({'detail': 'Quiz not found.'}, status=404)
+    transform = _anonymize if is_student else None
+    return _sse_response(_event_stream(quiz_channel(quiz_id), transform))
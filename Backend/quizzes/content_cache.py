@@ -0,0 +1,132 @@
+"""
+Cached quiz content for read endpoints.
+
+Quiz content does not change while a session is running, yet every student
+fetches the quiz list and multi-quiz decks again on each screen. Serialized
+payloads are stored in the Django cache (see CACHES) under versioned keys:
+
+- the standalone quiz list of a course is keyed by the course version,
+- a single quiz by its quiz version,
+- a multi-quiz deck by its deck version.
+
+Saving or deleting a quiz bumps the versions it affects (quizzes.signals),
+so stale entries are never read again and simply expire. Versions start
+from the current time in milliseconds, so a version key that was evicted
+never restarts at a number an old entry was stored under.
+
+The same versions serve as ETag validators for conditional GETs, which can
+be answered without touching the quiz table. There is no Last-Modified:
+HTTP dates have whole-second resolution, so two changes within a second
+would let an If-Modified-Since request revalidate stale content.
+"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+
+_config = getattr(settings, 'QUIZ_CONTENT_CACHE', {})
+CACHE_ALIAS = _config.get('ALIAS', 'default')
+CONTENT_TTL = _config.get('TTL', 3600)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _course_version_key(course_id):
+    return f'quizzes:content:course-version:{course_id}'
+
+
+def _quiz_version_key(quiz_id):
+    return f'quizzes:content:quiz-version:{quiz_id}'
+
+
+def _multi_version_key(multi_question_id):
+    return f'quizzes:content:multi-version:{multi_question_id}'
+
+
+def _version(version_key):
+    cache = _cache()
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, int(time.time() * 1000), None)
+        version = cache.get(version_key, 0)
+    return version
+
+
+def _bump(version_key):
+    try:
+        _cache().incr(version_key)
+    except ValueError:
+        # No version yet: nothing has been cached under this key
+        return
+
+
+def _validators(version_keys):
+    """
+    ETag token for a set of version keys: it changes whenever any of the
+    versions does. Versions are read with one get_many.
+    """
+    keys = list(version_keys)
+    found = _cache().get_many(keys)
+    parts = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            version = _version(key)
+        parts.append(f'{key.rsplit(":", 1)[-1]}v{version}')
+    return '.'.join(parts)
+
+
+def _get_or_build(key, build):
+    cache = _cache()
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        if value is not None:
+            cache.set(key, value, CONTENT_TTL)
+    return value
+
+
+def course_quiz_list(course_id, build):
+    """Serialized standalone quizzes of a course; build() computes them on a miss."""
+    key = f'quizzes:content:course:{course_id}:standalone:v{_version(_course_version_key(course_id))}'
+    return _get_or_build(key, build)
+
+
+def quiz_detail(quiz_id, build):
+    """
+    Cached entry for one quiz: {'created_by_id', 'course_id', 'data'}.
+    build() returns None when the quiz does not exist; misses are not cached.
+    """
+    key = f'quizzes:content:quiz:{quiz_id}:v{_version(_quiz_version_key(quiz_id))}'
+    return _get_or_build(key, build)
+
+
+def multi_quiz_questions(multi_question_id, build):
+    """
+    Cached entry for a multi-quiz deck: {'course_id', 'data'}.
+    build() returns None when the deck does not exist; misses are not cached.
+    """
+    key = f'quizzes:content:multi:{multi_question_id}:v{_version(_multi_version_key(multi_question_id))}'
+    return _get_or_build(key, build)
+
+
+def course_validators(course_ids):
+    """ETag token tracking every quiz change in the given courses."""
+    return _validators(_course_version_key(course_id) for course_id in sorted(set(course_ids)))
+
+
+def multi_quiz_validators(multi_question_id):
+    """ETag token tracking every change to one multi-quiz deck."""
+    return _validators([_multi_version_key(multi_question_id)])
+
+
+def invalidate_quiz_content(quiz_id=None, course_id=None, multi_question_id=None):
+    """Bump every version a changed quiz is part of."""
+    if quiz_id is not None:
+        _bump(_quiz_version_key(quiz_id))
+    if course_id is not None:
+        _bump(_course_version_key(course_id))
+    if multi_question_id is not None:
+        _bump(_multi_version_key(multi_question_id))
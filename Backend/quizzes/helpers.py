@@ -3,9 +3,13 @@ Helper functions and utilities for quiz operations.
 Provides clean separation of concerns and prevents code duplication.
 """
 from typing import Dict, List, Any, Optional
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Avg, Count, Max, Min, Q
 import json
+import re
+from .matching import build_keyword_matcher, compile_pattern
 
 
 class QuizTypeValidator:
@@ -84,8 +88,19 @@ class QuizGradingHelper:
                             correct_choices: List[Dict[str, Any]], 
                             allow_multiple: bool = False) -> Dict[str, Any]:
         """Grade multiple choice answers."""
-        correct_indices = [i for i, choice in enumerate(correct_choices) if choice.get('is_correct', False)]
-        
+        correct_indices = QuizGradingHelper.correct_choice_indices(correct_choices)
+        return QuizGradingHelper.grade_multiple_choice_indices(student_selections, correct_indices, allow_multiple)
+    
+    @staticmethod
+    def correct_choice_indices(choices: List[Dict[str, Any]]) -> List[int]:
+        """Indices of the choices marked as correct."""
+        return [i for i, choice in enumerate(choices) if choice.get('is_correct', False)]
+    
+    @staticmethod
+    def grade_multiple_choice_indices(student_selections: List[int], 
+                                      correct_indices: List[int], 
+                                      allow_multiple: bool = False) -> Dict[str, Any]:
+        """Grade multiple choice answers against precomputed correct indices."""
         if not allow_multiple:
             # Single choice - exact match required
             is_correct = len(student_selections) == 1 and student_selections[0] in correct_indices
@@ -106,31 +121,63 @@ class QuizGradingHelper:
             'score': score,
             'correct_selections': correct_selections,
             'incorrect_selections': incorrect_selections,
-            'expected_correct': correct_indices
+            'expected_correct': list(correct_indices)
         }
     
     @staticmethod
     def grade_short_answer(student_answer: str, correct_answer: str = None, 
-                          expected_keywords: str = None, case_sensitive: bool = False) -> Dict[str, Any]:
+                          expected_keywords: str = None, case_sensitive: bool = False,
+                          use_regex: bool = False) -> Dict[str, Any]:
         """Grade short answer questions."""
+        keywords = QuizGradingHelper.parse_keywords(expected_keywords, lowercase=not use_regex)
+        keyword_matcher = build_keyword_matcher(keywords, use_regex, case_sensitive)
+        correct_pattern = QuizGradingHelper.correct_answer_pattern(correct_answer, use_regex, case_sensitive)
+        return QuizGradingHelper.grade_short_answer_matched(
+            student_answer, correct_answer, keyword_matcher, case_sensitive, correct_pattern
+        )
+    
+    @staticmethod
+    def parse_keywords(expected_keywords: Optional[str], lowercase: bool = True) -> List[str]:
+        """Split comma-separated expected keywords into a normalized list."""
+        if not expected_keywords:
+            return []
+        # Regex keywords keep their case: \S and \s mean different things
+        return [kw.strip().lower() if lowercase else kw.strip() for kw in expected_keywords.split(',') if kw.strip()]
+    
+    @staticmethod
+    def correct_answer_pattern(correct_answer: Optional[str], use_regex: bool = False,
+                               case_sensitive: bool = False):
+        """Compiled pattern the whole answer must match when use_regex is on, else None."""
+        if not (use_regex and correct_answer):
+            return None
+        return compile_pattern(str(correct_answer), 0 if case_sensitive else re.IGNORECASE)
+    
+    @staticmethod
+    def grade_short_answer_matched(student_answer: str, correct_answer: str = None, 
+                                   keyword_matcher=None, case_sensitive: bool = False,
+                                   correct_pattern=None) -> Dict[str, Any]:
+        """
+        Grade short answer questions with a precompiled keyword matcher
+        (see quizzes.matching), finding every keyword in one pass.
+        """
         if not student_answer.strip():
             return {'is_correct': False, 'score': 0, 'feedback': 'No answer provided'}
         
         student_text = student_answer if case_sensitive else student_answer.lower()
         
         # Check exact match first
-        if correct_answer:
+        if correct_pattern is not None:
+            if correct_pattern.fullmatch(student_text):
+                return {'is_correct': True, 'score': 1, 'feedback': 'Correct!'}
+        elif correct_answer:
             correct_text = correct_answer if case_sensitive else correct_answer.lower()
             if student_text == correct_text:
                 return {'is_correct': True, 'score': 1, 'feedback': 'Correct!'}
         
         # Check keyword matching
-        if expected_keywords:
-            keywords = [kw.strip().lower() for kw in expected_keywords.split(',') if kw.strip()]
-            if not case_sensitive:
-                student_text = student_text.lower()
-            
-            matched_keywords = [kw for kw in keywords if kw in student_text]
+        keywords = keyword_matcher.keywords if keyword_matcher is not None else ()
+        if keywords:
+            matched_keywords = keyword_matcher.match(student_text)
             if matched_keywords:
                 score = len(matched_keywords) / len(keywords)
                 return {
@@ -145,10 +192,39 @@ class QuizGradingHelper:
 class QuizStatisticsHelper:
     """Calculates quiz statistics and analytics."""
     
+    # Upper bounds (inclusive) of the score distribution buckets
+    SCORE_BUCKETS = [
+        ('0-20%', None, Decimal('0.2')),
+        ('21-40%', Decimal('0.2'), Decimal('0.4')),
+        ('41-60%', Decimal('0.4'), Decimal('0.6')),
+        ('61-80%', Decimal('0.6'), Decimal('0.8')),
+        ('81-100%', Decimal('0.8'), None),
+    ]
+    
     @staticmethod
     def calculate_quiz_statistics(submissions: models.QuerySet) -> Dict[str, Any]:
-        """Calculate comprehensive quiz statistics."""
-        total_submissions = submissions.count()
+        """
+        Calculate comprehensive quiz statistics.
+        Runs as a single aggregate query; submissions are never loaded into Python.
+        """
+        aggregates = {
+            'total_submissions': Count('id'),
+            'graded_submissions': Count('score'),
+            'average_score': Avg('score'),
+            'highest_score': Max('score'),
+            'lowest_score': Min('score'),
+        }
+        for i, (_, lower, upper) in enumerate(QuizStatisticsHelper.SCORE_BUCKETS):
+            condition = Q(score__isnull=False)
+            if lower is not None:
+                condition &= Q(score__gt=lower)
+            if upper is not None:
+                condition &= Q(score__lte=upper)
+            aggregates[f'bucket_{i}'] = Count('id', filter=condition)
+        
+        stats = submissions.order_by().aggregate(**aggregates)
+        
+        total_submissions = stats['total_submissions']
         if total_submissions == 0:
             return {
                 'total_submissions': 0,
@@ -157,35 +233,16 @@ class QuizStatisticsHelper:
                 'score_distribution': {}
             }
         
-        scores = [sub.score for sub in submissions if sub.score is not None]
-        average_score = sum(scores) / len(scores) if scores else 0
-        
-        # Score distribution
-        score_ranges = {
-            '0-20%': 0,
-            '21-40%': 0,
-            '41-60%': 0,
-            '61-80%': 0,
-            '81-100%': 0
-        }
-        
-        for score in scores:
-            if score <= 0.2:
-                score_ranges['0-20%'] += 1
-            elif score <= 0.4:
-                score_ranges['21-40%'] += 1
-            elif score <= 0.6:
-                score_ranges['41-60%'] += 1
-            elif score <= 0.8:
-                score_ranges['61-80%'] += 1
-            else:
-                score_ranges['81-100%'] += 1
+        average_score = stats['average_score'] or 0
         
         return {
             'total_submissions': total_submissions,
             'average_score': round(average_score, 2),
-            'completion_rate': len(scores) / total_submissions,
-            'score_distribution': score_ranges,
-            'highest_score': max(scores) if scores else 0,
-            'lowest_score': min(scores) if scores else 0
+            'completion_rate': stats['graded_submissions'] / total_submissions,
+            'score_distribution': {
+                label: stats[f'bucket_{i}']
+                for i, (label, _, _) in enumerate(QuizStatisticsHelper.SCORE_BUCKETS)
+            },
+            'highest_score': stats['highest_score'] if stats['highest_score'] is not None else 0,
+            'lowest_score': stats['lowest_score'] if stats['lowest_score'] is not None else 0
         }
@@ -0,0 +1,80 @@
+import random
+import string
+import time
+from django.core.management.base import BaseCommand, CommandError
+from quizzes.helpers import QuizGradingHelper
+from quizzes.matching import KeywordMatcher
+
+
+class Command(BaseCommand):
+    help = 'Compare per-keyword scans with the precompiled keyword matcher for short answer grading (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keywords',
+            type=int,
+            default=1000,
+            help='Number of expected keywords (default: 1000)'
+        )
+        parser.add_argument(
+            '--answers',
+            type=int,
+            default=10000,
+            help='Number of answers to grade (default: 10000)'
+        )
+        parser.add_argument(
+            '--words-per-answer',
+            type=int,
+            default=40,
+            help='Words in each generated answer (default: 40)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the generated keywords and answers (default: 42)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = self.vocabulary(rng, max(options['keywords'] * 4, 100))
+        keywords = rng.sample(vocabulary, options['keywords'])
+        answers = [
+            ' '.join(rng.choice(vocabulary) for _ in range(options['words_per_answer']))
+            for _ in range(options['answers'])
+        ]
+        expected_keywords = ','.join(keywords)
+
+        started = time.perf_counter()
+        parsed = QuizGradingHelper.parse_keywords(expected_keywords)
+        scanned = []
+        for answer in answers:
+            text = answer.lower()
+            scanned.append([kw for kw in parsed if kw in text])
+        scan_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        matcher = KeywordMatcher(QuizGradingHelper.parse_keywords(expected_keywords))
+        compile_seconds = time.perf_counter() - started
+        matched = [matcher.match(answer.lower()) for answer in answers]
+        match_seconds = time.perf_counter() - started
+
+        if matched != scanned:
+            raise CommandError('Matcher results differ from per-keyword scans')
+
+        total = len(answers)
+        self.stdout.write(f"{len(keywords)} keywords x {total} answers ({options['words_per_answer']} words each)")
+        self.stdout.write(f"  per-keyword scans: {scan_seconds * 1000:10.1f} ms ({total / scan_seconds:,.0f} answers/s)")
+        self.stdout.write(
+            f"  compiled matcher:  {match_seconds * 1000:10.1f} ms ({total / match_seconds:,.0f} answers/s, "
+            f"compile {compile_seconds * 1000:.1f} ms)"
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Results identical; speedup {scan_seconds / match_seconds:.1f}x'))
+
+    @staticmethod
+    def vocabulary(rng, size):
+        """Distinct lowercase pseudo-words of 4-10 letters."""
+        words = set()
+        while len(words) < size:
+            words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))))
+        return sorted(words)
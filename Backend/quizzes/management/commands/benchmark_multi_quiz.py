@@ -0,0 +1,115 @@
+import time
+import uuid
+from types import SimpleNamespace
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from courses.models import Course
+from quizzes.models import Quiz
+from quizzes.serializers import MultiQuizSerializer
+
+
+class Rollback(Exception):
+    """Raised to discard everything a benchmark run wrote."""
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row and bulk multi-quiz creation for decks of several sizes (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 500],
+            help='Deck sizes to benchmark (default: 10 100 500)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per deck size and path; the best time is reported (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'questions':>10} {'path':>8} {'best ms':>10} {'queries':>8}")
+        for size in options['sizes']:
+            deck = self.build_deck(size)
+            for name, create in (('per-row', self.create_per_row), ('bulk', self.create_bulk)):
+                best, queries = None, 0
+                for _ in range(options['repeat']):
+                    elapsed, queries = self.run_once(create, deck)
+                    best = elapsed if best is None else min(best, elapsed)
+                self.stdout.write(f"{size:>10} {name:>8} {best * 1000:>10.1f} {queries:>8}")
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark complete (no data was kept)'))
+
+    @staticmethod
+    def build_deck(size):
+        """A deck alternating multiple choice and short answer questions."""
+        questions = []
+        for order in range(1, size + 1):
+            if order % 2:
+                questions.append({
+                    'title': f'Question {order}',
+                    'quiz_type': 'multiple_choice',
+                    'properties': {
+                        'question_text': f'Pick the right answer ({order})',
+                        'choices': [{'text': 'A', 'is_correct': True}, {'text': 'B'}, {'text': 'C'}],
+                    },
+                    'question_order': order,
+                })
+            else:
+                questions.append({
+                    'title': f'Question {order}',
+                    'quiz_type': 'short_answer',
+                    'properties': {
+                        'question_text': f'Explain ({order})',
+                        'correct_answer': 'answer',
+                        'expected_keywords': 'answer, reason',
+                    },
+                    'question_order': order,
+                })
+        return questions
+
+    @staticmethod
+    def run_once(create, deck):
+        """Time one deck creation inside a transaction that is then rolled back."""
+        try:
+            with transaction.atomic():
+                teacher = User.objects.create_user(username=f'bench-{uuid.uuid4().hex}', password=None)
+                course = Course.objects.create(name=f'Benchmark {uuid.uuid4().hex}', teacher=teacher)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    create(teacher, course, deck)
+                    elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        return elapsed, len(queries.captured_queries)
+
+    @staticmethod
+    def create_per_row(teacher, course, deck):
+        """The previous path: one INSERT per question, no validation."""
+        multi_question_id = uuid.uuid4()
+        for question_data in deck:
+            Quiz.objects.create(
+                course=course,
+                title=question_data['title'],
+                quiz_type=question_data['quiz_type'],
+                properties=question_data['properties'],
+                multi_question_id=multi_question_id,
+                question_order=question_data['question_order'],
+                created_by=teacher
+            )
+
+    @staticmethod
+    def create_bulk(teacher, course, deck):
+        """The validated bulk path used by the multi-quiz endpoint."""
+        serializer = MultiQuizSerializer(
+            data={'title': 'Benchmark', 'course': course.id, 'questions': deck},
+            context={'request': SimpleNamespace(user=teacher)}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
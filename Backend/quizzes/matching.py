@@ -0,0 +1,149 @@
+"""
+Precompiled keyword matchers for short answer grading.
+
+Grading checks which of a quiz's expected keywords occur in an answer.
+Scanning once per keyword costs O(keywords x answer length) per answer; the
+matchers here are compiled once per quiz version (see quizzes.rules) and
+find every keyword in a single pass over the answer:
+
+- KeywordMatcher builds an Aho-Corasick automaton for plain keywords
+  (small keyword sets are scanned directly, which is faster in Python),
+- RegexKeywordMatcher searches compiled patterns when the quiz sets
+  use_regex; compiled patterns are shared through an LRU cache.
+
+Both return the matched keywords in declaration order, duplicates included,
+exactly like [kw for kw in keywords if kw in text].
+"""
+import re
+from collections import deque
+from functools import lru_cache
+
+
+# Below this many distinct keywords, per-keyword substring scans (which run
+# in C) beat the pure Python automaton; see benchmark_keyword_matching
+AHO_CORASICK_MIN_KEYWORDS = 200
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern, flags=0):
+    """
+    Compile a quiz-supplied regular expression. Invalid patterns are matched
+    literally so a typo in a quiz never breaks grading.
+    """
+    try:
+        return re.compile(pattern, flags)
+    except re.error:
+        return re.compile(re.escape(pattern), flags)
+
+
+class _KeywordIndex:
+    """Maps distinct keywords back to their positions in the declared list."""
+
+    def __init__(self, keywords):
+        self.keywords = tuple(keywords)
+        self.positions = {}
+        for position, keyword in enumerate(self.keywords):
+            self.positions.setdefault(keyword, []).append(position)
+
+    def expand(self, found):
+        """Matched keywords in declaration order, duplicates included."""
+        if not found:
+            return []
+        if len(found) == len(self.positions):
+            return list(self.keywords)
+        positions = sorted(p for keyword in found for p in self.positions[keyword])
+        return [self.keywords[p] for p in positions]
+
+
+class KeywordMatcher(_KeywordIndex):
+    """Finds which plain keywords occur as substrings of a text."""
+
+    def __init__(self, keywords):
+        super().__init__(keyword for keyword in keywords if keyword)
+        self.distinct = tuple(self.positions)
+        self.use_automaton = len(self.distinct) >= AHO_CORASICK_MIN_KEYWORDS
+        if self.use_automaton:
+            self._build()
+
+    def _build(self):
+        # Trie: goto[state] maps a character to the next state
+        goto = [{}]
+        outputs = [()]
+        for keyword in self.distinct:
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] = (keyword,)
+
+        # Failure links, breadth first; outputs inherit their suffix's outputs
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                candidate = goto[fallback].get(char, 0)
+                # Depth-one states fail to the root, never to themselves
+                fail[next_state] = candidate if candidate != next_state else 0
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    def find(self, text):
+        """Set of distinct keywords occurring in text."""
+        if not self.use_automaton:
+            return {keyword for keyword in self.distinct if keyword in text}
+
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+                if len(found) == len(self.distinct):
+                    break
+        return found
+
+    def match(self, text):
+        """Matched keywords in declaration order, duplicates included."""
+        return self.expand(self.find(text))
+
+
+class RegexKeywordMatcher(_KeywordIndex):
+    """Finds which keyword patterns have a match in a text."""
+
+    def __init__(self, patterns, case_sensitive=False):
+        super().__init__(pattern for pattern in patterns if pattern)
+        flags = 0 if case_sensitive else re.IGNORECASE
+        self.compiled = tuple(
+            (pattern, compile_pattern(pattern, flags)) for pattern in self.positions
+        )
+
+    def find(self, text):
+        """Set of distinct patterns with a match in text."""
+        return {pattern for pattern, compiled in self.compiled if compiled.search(text)}
+
+    def match(self, text):
+        """Matched patterns in declaration order, duplicates included."""
+        return self.expand(self.find(text))
+
+
+def build_keyword_matcher(keywords, use_regex=False, case_sensitive=False):
+    """Compile the matcher for a quiz's parsed expected keywords."""
+    if use_regex:
+        return RegexKeywordMatcher(keywords, case_sensitive)
+    return KeywordMatcher(keywords)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        ('quizzes', '0005_quiz_multi_question_id_quiz_question_order_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['created_by', 'multi_question_id'], name='quiz_creator_multi_idx'),
+        ),
+    ]
@@ -1,9 +1,10 @@
-
+import re
 from django.db import models
 from django.core.exceptions import ValidationError
 from courses.models import Course
 from django.contrib.auth.models import User
-from .helpers import QuizTypeValidator
+from .helpers import QuizTypeValidator, QuizGradingHelper
+from .rules import invalidate_quiz_rules
 from .constants import ValidationLimits, ErrorMessages, QuizTypeCodes, QuizTypeNames
 
 
@@ -50,19 +51,61 @@ class Quiz(models.Model):
     # Type-specific properties stored as flexible JSON
     properties = models.JSONField(default=dict)
 
+    # Bumped on every save; keys the compiled rules cache (see quizzes.rules)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
     class Meta:
         ordering = ['-created_at']
         constraints = [
+            # Also serves as the partial (multi_question_id, question_order) index
+            # used to fetch a multi-quiz's questions in order
             models.UniqueConstraint(
                 fields=['multi_question_id', 'question_order'],
                 condition=models.Q(multi_question_id__isnull=False),
                 name='unique_question_order_per_multi_quiz'
             )
         ]
+        indexes = [
+            # Teacher's multi-quiz listing
+            models.Index(fields=['created_by', 'multi_question_id'], name='quiz_creator_multi_idx'),
+        ]
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember where a loaded quiz was listed, so moving it invalidates both places."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_placement = (
+            instance.__dict__.get('course_id'),
+            instance.__dict__.get('multi_question_id'),
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the quiz, bumping its version so cached rules are recompiled.
+        The bump happens in the database, so concurrent edits of the same
+        quiz never write the same version.
+        """
+        bumped = not self._state.adding
+        if bumped:
+            self.version = models.F('version') + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'version' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'version']
+        super().save(*args, **kwargs)
+        if bumped:
+            self.refresh_from_db(fields=['version'])
+        invalidate_quiz_rules(self.id)
+
     def clean(self):
         """Validate quiz based on its type and properties."""
+        self.clean_properties()
+        self.clean_question_order()
+        self.clean_multi_quiz_membership()
+
+    def clean_properties(self):
+        """Validate the type-specific properties. Runs no queries."""
         # Basic question text presence per type
         props = self.properties or {}
 
@@ -89,6 +132,16 @@ class Quiz(models.Model):
             # Ensure at least one grading basis exists
             if not (correct_answer or (expected_keywords and str(expected_keywords).strip())):
                 raise ValidationError("Either correct answer or expected keywords must be provided for grading.")
+            # With use_regex, the correct answer and every keyword are regular expressions
+            if props.get('use_regex'):
+                patterns = QuizGradingHelper.parse_keywords(expected_keywords, lowercase=False)
+                if correct_answer:
+                    patterns.append(str(correct_answer))
+                for pattern in patterns:
+                    try:
+                        re.compile(pattern)
+                    except re.error as e:
+                        raise ValidationError(f"Invalid regular expression '{pattern}': {e}")
 
         elif self.quiz_type == QuizTypeCodes.WORD_CLOUD:
             max_words_per_student = int(props.get('max_words_per_student', 1))
@@ -109,6 +162,11 @@ class Quiz(models.Model):
                 raise ValidationError("Canvas width must be a positive integer")
             if not isinstance(canvas_height, int) or canvas_height <= 0:
                 raise ValidationError("Canvas height must be a positive integer")
+            # Bounds the memory needed to rasterize stroke drawings
+            if max(canvas_width, canvas_height) > ValidationLimits.MAX_CANVAS_SIZE:
+                raise ValidationError(
+                    f"Canvas width and height cannot exceed {ValidationLimits.MAX_CANVAS_SIZE} pixels"
+                )
 
         elif self.quiz_type == QuizTypeCodes.IMAGE_UPLOAD:
             # Basic validation for image upload quiz properties
@@ -119,13 +177,16 @@ class Quiz(models.Model):
             if not isinstance(allowed_formats, str) or not allowed_formats.strip():
                 raise ValidationError("Allowed formats must be a non-empty string")
 
-        # Multi-quiz validation
+    def clean_question_order(self):
+        """Validate question_order against multi-quiz membership. Runs no queries."""
         if self.multi_question_id and self.question_order == 0:
             raise ValidationError("Questions in multi-quiz must have order > 0")
         
         if not self.multi_question_id and self.question_order > 0:
             raise ValidationError("Standalone quizzes should have order = 0")
-        
+
+    def clean_multi_quiz_membership(self):
+        """Validate that the quiz matches the other questions already in its multi-quiz."""
         # Validate that all questions in a multi-quiz belong to the same course
         if self.multi_question_id:
             existing_quizzes = Quiz.objects.filter(multi_question_id=self.multi_question_id).exclude(id=self.id)
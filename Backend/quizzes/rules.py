@@ -0,0 +1,106 @@
+"""
+Compiled per-quiz rules.
+
+Answer validation and grading both need values derived from quiz.properties:
+choice limits, the set of correct choices, keyword lists and their compiled
+matcher (quizzes.matching), word-length limits, the drawing canvas size and
+allowed upload formats. QuizRules derives them once per quiz version; the
+compiled objects live in a bounded process-local LRU keyed by (quiz id,
+version, properties digest) and are dropped when the quiz is saved. The
+digest keeps rules from outliving their properties when a quiz is changed
+without save() (QuerySet.update() does not bump the version).
+"""
+import hashlib
+import json
+from django.conf import settings
+from classpoint_backend.local_cache import LocalTTLCache
+from .helpers import QuizGradingHelper
+from .matching import build_keyword_matcher
+
+
+_config = getattr(settings, 'QUIZ_RULES_CACHE', {})
+_rules_cache = LocalTTLCache(
+    ttl=_config.get('TTL', 3600),
+    max_entries=_config.get('MAX_ENTRIES', 1024),
+)
+
+
+def _int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class QuizRules:
+    """Immutable limits and lookup tables derived from one version of a quiz."""
+
+    def __init__(self, quiz):
+        props = quiz.properties or {}
+        self.quiz_id = quiz.id
+        self.version = quiz.version
+        self.quiz_type = quiz.quiz_type
+
+        # Multiple choice
+        choices = props.get('choices', []) or []
+        self.choice_count = len(choices)
+        self.correct_indices = frozenset(QuizGradingHelper.correct_choice_indices(choices))
+        self.allow_multiple = bool(props.get('allow_multiple_choices', False))
+        self.max_choices = _int(props.get('max_choices', 1), 1)
+        self.min_choices = _int(props.get('min_choices', 1), 1)
+
+        # Short answer
+        self.correct_answer = props.get('correct_answer')
+        self.case_sensitive = bool(props.get('case_sensitive', False))
+        self.use_regex = bool(props.get('use_regex', False))
+        self.keywords = tuple(QuizGradingHelper.parse_keywords(
+            props.get('expected_keywords'), lowercase=not self.use_regex
+        ))
+        self.keyword_matcher = build_keyword_matcher(self.keywords, self.use_regex, self.case_sensitive)
+        self.correct_answer_pattern = QuizGradingHelper.correct_answer_pattern(
+            self.correct_answer, self.use_regex, self.case_sensitive
+        )
+
+        # Word cloud
+        self.max_words = _int(props.get('max_words_per_student', 1), 1)
+        self.min_words = _int(props.get('min_words_per_student', 1), 1)
+        self.allow_duplicates = bool(props.get('allow_duplicates', False))
+        self.normalize_case = bool(props.get('normalize_case', True))
+        self.max_word_length = _int(props.get('max_word_length', 50), 50)
+        self.min_word_length = _int(props.get('min_word_length', 1), 1)
+
+        # Drawing
+        self.canvas_width = _int(props.get('canvas_width', 800), 800)
+        self.canvas_height = _int(props.get('canvas_height', 600), 600)
+
+        # Image upload
+        self.max_file_size_mb = _int(props.get('max_file_size_mb', 5), 5)
+        self.max_file_size_bytes = self.max_file_size_mb * 1024 * 1024
+        self.allowed_formats = tuple(str(props.get('allowed_formats', 'jpg,png,jpeg')).split(','))
+        self.allowed_extensions = frozenset(fmt.strip().lower().lstrip('.') for fmt in self.allowed_formats)
+
+    @property
+    def max_choice_index(self):
+        return self.choice_count - 1
+
+
+def _properties_digest(quiz):
+    payload = json.dumps([quiz.quiz_type, quiz.properties], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=8).digest()
+
+
+def get_quiz_rules(quiz):
+    """Return the compiled rules for this version of the quiz."""
+    key = (quiz.id, quiz.version, _properties_digest(quiz))
+    rules = _rules_cache.get(key)
+    if rules is None:
+        rules = QuizRules(quiz)
+        # Unsaved quizzes have no id; never cache their rules
+        if quiz.id is not None:
+            _rules_cache.set(key, rules)
+    return rules
+
+
+def invalidate_quiz_rules(quiz_id):
+    """Drop every cached version of a quiz's rules."""
+    _rules_cache.delete_where(lambda key, rules: key[0] == quiz_id)
@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
 from .models import Quiz
+from .content_cache import invalidate_quiz_content
 from .constants import QuizTypeCodes
 import uuid
 
@@ -33,11 +35,17 @@ class QuizSerializer(serializers.ModelSerializer):
 # Multi-Quiz Serializers
 class QuestionDataSerializer(serializers.Serializer):
     """Serializer for individual question data within a multi-quiz"""
-    title = serializers.CharField()
+    title = serializers.CharField(max_length=255)
     quiz_type = serializers.CharField()
     properties = serializers.DictField()
     question_order = serializers.IntegerField()
 
+    def validate_quiz_type(self, value):
+        """Validate that the quiz type is one of the supported types"""
+        if value not in dict(Quiz._meta.get_field('quiz_type').choices):
+            raise serializers.ValidationError(f"Unsupported quiz type: {value}")
+        return value
+
 
 class MultiQuizSerializer(serializers.Serializer):
     """Serializer for creating entire multi-quiz"""
@@ -55,24 +63,31 @@ class MultiQuizSerializer(serializers.Serializer):
         except Course.DoesNotExist:
             raise serializers.ValidationError("Course does not exist")
     
-    def create(self, validated_data):
-        """Create multiple Quiz objects with same multi_question_id"""
+    def validate_questions(self, value):
+        """Validate that the deck is non-empty and question orders are unique"""
+        if not value:
+            raise serializers.ValidationError("A multi-quiz needs at least one question")
+        orders = [question['question_order'] for question in value]
+        if len(set(orders)) != len(orders):
+            raise serializers.ValidationError("Question orders must be unique within a multi-quiz")
+        return value
+
+    def validate(self, attrs):
+        """
+        Build every question as an unsaved Quiz and run the per-type rules on
+        it, so an invalid question rejects the whole deck before any insert.
+        """
         request = self.context.get('request')
         if not request or not request.user:
             raise serializers.ValidationError("User must be authenticated")
-        
-        # Generate unique multi_question_id
+
+        # A fresh id has no existing members, so only the query-free checks apply
         multi_question_id = uuid.uuid4()
-        
-        # Get course
-        from courses.models import Course
-        course = Course.objects.get(id=validated_data['course'])
-        
-        # Create Quiz objects for each question
-        created_quizzes = []
-        for question_data in validated_data['questions']:
-            quiz = Quiz.objects.create(
-                course=course,
+        quizzes = []
+        errors = {}
+        for index, question_data in enumerate(attrs['questions']):
+            quiz = Quiz(
+                course_id=attrs['course'],
                 title=question_data['title'],
                 quiz_type=question_data['quiz_type'],
                 properties=question_data['properties'],
@@ -80,12 +95,37 @@ class MultiQuizSerializer(serializers.Serializer):
                 question_order=question_data['question_order'],
                 created_by=request.user
             )
-            created_quizzes.append(quiz)
+            try:
+                quiz.clean_properties()
+                quiz.clean_question_order()
+            except DjangoValidationError as e:
+                errors[index] = e.messages
+            except (TypeError, ValueError) as e:
+                errors[index] = [str(e)]
+            quizzes.append(quiz)
+
+        if errors:
+            raise serializers.ValidationError({'questions': errors})
+
+        attrs['multi_question_id'] = multi_question_id
+        attrs['quizzes'] = quizzes
+        return attrs
+
+    def create(self, validated_data):
+        """Insert every question of the multi-quiz with one bulk_create"""
+        with transaction.atomic():
+            # Primary keys are set on the instances, so no re-query is needed
+            created_quizzes = Quiz.objects.bulk_create(validated_data['quizzes'])
+            # bulk_create sends no post_save signals
+            transaction.on_commit(lambda: invalidate_quiz_content(
+                course_id=validated_data['course'],
+                multi_question_id=validated_data['multi_question_id'],
+            ))
         
         return {
-            'multi_question_id': multi_question_id,
+            'multi_question_id': validated_data['multi_question_id'],
             'title': validated_data['title'],
-            'course': course.id,
+            'course': validated_data['course'],
             'questions': created_quizzes
         }
 
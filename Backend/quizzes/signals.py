@@ -0,0 +1,31 @@
+"""
+Invalidate cached quiz content when quizzes change.
+
+Receivers run for Quiz.save() and for every deleted quiz, including queryset
+and cascading deletes. bulk_create sends no signals, so bulk paths call
+invalidate_quiz_content themselves. Versions are bumped once the
+transaction commits, so a concurrent reader cannot cache the old rows under
+the new version.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .content_cache import invalidate_quiz_content
+from .models import Quiz
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    quiz_id = instance.id
+    placements = {(instance.course_id, instance.multi_question_id)}
+    loaded = getattr(instance, '_loaded_placement', None)
+    if loaded is not None:
+        placements.add(loaded)
+
+    def invalidate():
+        invalidate_quiz_content(quiz_id=quiz_id)
+        for course_id, multi_question_id in placements:
+            invalidate_quiz_content(course_id=course_id, multi_question_id=multi_question_id)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,78 @@
+"""
+Cached quiz and class statistics.
+
+Statistics are computed by QuizStatisticsHelper in a single aggregate query
+and cached in the shared Django cache. Per-quiz entries are deleted when a
+quiz receives new graded submissions; per-class entries are keyed by a
+course-level version that is bumped at the same time. Statistics computed
+on a lagging read replica are kept only briefly, since grades that just
+invalidated them may not have reached the replica yet.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from classpoint_backend.db_router import reading_from_replica
+from .helpers import QuizStatisticsHelper
+
+
+STATISTICS_CACHE_TTL = getattr(settings, 'STATISTICS_CACHE_TTL', 300)
+REPLICA_STATISTICS_CACHE_TTL = getattr(settings, 'REPLICA_STATISTICS_CACHE_TTL', 15)
+
+
+def _ttl():
+    return REPLICA_STATISTICS_CACHE_TTL if reading_from_replica() else STATISTICS_CACHE_TTL
+
+
+def _quiz_key(quiz_id):
+    return f'quizzes:stats:quiz:{quiz_id}'
+
+
+def _course_version_key(course_id):
+    return f'quizzes:stats:course-version:{course_id}'
+
+
+def _class_key(class_id, course_version):
+    return f'quizzes:stats:class:{class_id}:v{course_version}'
+
+
+def _course_version(course_id):
+    version = cache.get(_course_version_key(course_id))
+    if version is None:
+        cache.add(_course_version_key(course_id), 1, None)
+        version = cache.get(_course_version_key(course_id), 1)
+    return version
+
+
+def quiz_statistics(quiz):
+    """Statistics over every submission of a quiz."""
+    key = _quiz_key(quiz.id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = QuizStatisticsHelper.calculate_quiz_statistics(quiz.submissions.all())
+        cache.set(key, stats, _ttl())
+    return stats
+
+
+def class_statistics(classroom):
+    """Statistics over submissions by the class's students to its course's quizzes."""
+    from students.models import StudentQuizSubmission
+
+    key = _class_key(classroom.id, _course_version(classroom.course_id))
+    stats = cache.get(key)
+    if stats is None:
+        submissions = StudentQuizSubmission.objects.filter(
+            quiz__course_id=classroom.course_id,
+            student__enrollments__classroom=classroom
+        )
+        stats = QuizStatisticsHelper.calculate_quiz_statistics(submissions)
+        cache.set(key, stats, _ttl())
+    return stats
+
+
+def invalidate_statistics(quiz_id, course_id):
+    """Drop cached statistics affected by new submissions to a quiz."""
+    cache.delete(_quiz_key(quiz_id))
+    try:
+        cache.incr(_course_version_key(course_id))
+    except ValueError:
+        # No version yet: nothing cached for this course's classes
+        pass
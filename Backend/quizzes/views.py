@@ -1,24 +1,34 @@
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.contrib.auth.models import User
 from django.db import transaction
 from django.db.models import Count
+from django.http import Http404
 from .models import Quiz
+from . import content_cache
 from .serializers import QuizSerializer, MultiQuizSerializer, MultiQuizListSerializer
 from .constants import QuizTypeCodes
+from classpoint_backend.db_router import ReplicaReadsMixin
 import uuid
 
 
 # -------- QUIZZES --------
-class QuizViewSet(viewsets.ModelViewSet):
+class QuizViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     CRUD operations for quizzes (includes global options).
+    Statistics read from the replica when one is configured.
     """
     queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ('statistics',)
 
     def get_queryset(self):
+        # Student tokens authenticate a StudentUser: no quiz is theirs to manage
+        if not isinstance(self.request.user, User):
+            return Quiz.objects.none()
         # For list: only standalone quizzes
         # For update/delete: include all quizzes (including multi-quiz questions)
         if self.action in ['list']:
@@ -32,6 +42,77 @@ class QuizViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """Serialized quiz from the versioned content cache; only its creator may read it."""
+        # Student tokens authenticate a StudentUser whose id is a Student pk, not a User pk
+        if not isinstance(request.user, User):
+            raise Http404
+        try:
+            quiz_id = int(kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            raise Http404
+
+        def build():
+            quiz = Quiz.objects.filter(pk=quiz_id).first()
+            if quiz is None:
+                return None
+            return {
+                'created_by_id': quiz.created_by_id,
+                'data': self.get_serializer(quiz).data,
+            }
+
+        entry = content_cache.quiz_detail(quiz_id, build)
+        if entry is None or entry['created_by_id'] != request.user.id:
+            raise Http404
+        return Response(entry['data'])
+
+    @action(detail=True, methods=['get'], url_path='live-results')
+    def live_results(self, request, pk=None):
+        """Live tally for a multiple choice quiz, read from its running aggregate."""
+        from live.aggregation import multiple_choice_results
+
+        quiz = self.get_object()
+        if quiz.quiz_type != QuizTypeCodes.MULTIPLE_CHOICE:
+            return Response(
+                {'detail': 'Live results are only available for multiple choice quizzes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(multiple_choice_results(quiz))
+
+    @action(detail=True, methods=['get'])
+    def statistics(self, request, pk=None):
+        """Score statistics over all submissions of this quiz (cached)."""
+        from .statistics import quiz_statistics
+
+        quiz = self.get_object()
+        return Response({'quiz_id': quiz.id, **quiz_statistics(quiz)})
+
+    @action(detail=True, methods=['get'], url_path='word-cloud')
+    def word_cloud(self, request, pk=None):
+        """
+        Top-N word frequencies for a word cloud quiz (?top=50).
+        Responds 304 when If-None-Match carries the current version token.
+        """
+        from live.aggregation import word_cloud_results, word_cloud_version
+
+        quiz = self.get_object()
+        if quiz.quiz_type != QuizTypeCodes.WORD_CLOUD:
+            return Response(
+                {'detail': 'Word frequencies are only available for word cloud quizzes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            top = max(1, min(int(request.query_params.get('top', 50)), 500))
+        except ValueError:
+            return Response({'detail': 'top must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag = f'"wc-{quiz.id}-{word_cloud_version(quiz)}-{top}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        return Response(word_cloud_results(quiz, top=top), headers={'ETag': etag})
+
 
 # -------- CREATE ENDPOINTS PER TYPE (single call) --------
 class CreateShortAnswerQuizView(APIView):
@@ -107,6 +188,14 @@ class CreateWordCloudQuizView(APIView):
 
 
 # Multi-Quiz Views
+def group_by_multi_question_id(questions):
+    """Group serialized multi-quiz questions (already ordered) by multi_question_id."""
+    result = {}
+    for question in questions:
+        result.setdefault(str(question['multi_question_id']), []).append(question)
+    return result
+
+
 class MultiQuizViewSet(viewsets.ViewSet):
     """ViewSet for managing multi-quiz operations"""
     permission_classes = [permissions.IsAuthenticated]
@@ -120,21 +209,9 @@ class MultiQuizViewSet(viewsets.ViewSet):
     
     def list(self, request):
         """List all multi-quiz grouped by multi_question_id"""
-        # Get all unique multi_question_ids for this teacher
-        multi_quiz_ids = Quiz.objects.filter(
-            created_by=request.user,
-            multi_question_id__isnull=False
-        ).values_list('multi_question_id', flat=True).distinct()
-        
-        # Build response with quizzes grouped by multi_question_id
-        result = {}
-        for multi_id in multi_quiz_ids:
-            quizzes = Quiz.objects.filter(multi_question_id=multi_id).order_by('question_order')
-            if quizzes.exists():
-                quiz_serializer = QuizSerializer(quizzes, many=True)
-                result[str(multi_id)] = quiz_serializer.data
-        
-        return Response(result)
+        # One ordered query for every question of this teacher's multi-quizzes
+        quizzes = self.get_queryset().order_by('multi_question_id', 'question_order')
+        return Response(group_by_multi_question_id(QuizSerializer(quizzes, many=True).data))
     
     def create(self, request):
         """Create a new multi-quiz with multiple questions"""
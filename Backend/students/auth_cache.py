@@ -0,0 +1,118 @@
+"""
+Caches backing student token authentication.
+
+Student requests arrive in bursts (every student polls at once during a live
+slide), so the enrollment lookup behind each token is cached in two tiers:
+a short-lived process-local cache and the shared Django cache. Class
+"active" flags are cached separately so ending a class can revoke access
+for all of its students without touching every enrollment entry.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+from classpoint_backend.local_cache import LocalTTLCache
+
+
+_config = getattr(settings, 'STUDENT_AUTH_CACHE', {})
+LOCAL_TTL = _config.get('LOCAL_TTL', 5)
+SHARED_TTL = _config.get('SHARED_TTL', 300)
+MAX_ENTRIES = _config.get('MAX_ENTRIES', 10000)
+
+_claims = LocalTTLCache(ttl=LOCAL_TTL, max_entries=MAX_ENTRIES)
+_enrollments = LocalTTLCache(ttl=LOCAL_TTL, max_entries=MAX_ENTRIES)
+_class_active = LocalTTLCache(ttl=LOCAL_TTL, max_entries=MAX_ENTRIES)
+
+
+def _enrollment_key(enrollment_id):
+    return f'students:enrollment:{enrollment_id}'
+
+
+def _class_active_key(class_id):
+    return f'classes:active:{class_id}'
+
+
+# -------- VERIFIED TOKEN CLAIMS --------
+def get_claims(jti, token):
+    """Return previously verified claims for this exact token, if cached."""
+    entry = _claims.get(jti)
+    if entry is None or entry[0] != token:
+        return None
+    return entry[1]
+
+
+def remember_claims(jti, token, payload):
+    """Cache verified claims until the token itself expires."""
+    ttl = payload.get('exp', 0) - time.time()
+    if ttl > 0:
+        _claims.set(jti, (token, payload), ttl=ttl)
+
+
+# -------- ENROLLMENTS --------
+def get_enrollment(enrollment_id):
+    """
+    Return the enrollment (with student, classroom and course loaded).
+    Raises StudentClassEnrollment.DoesNotExist if it is gone.
+    """
+    enrollment = _enrollments.get(enrollment_id)
+    if enrollment is not None:
+        return enrollment
+
+    enrollment = cache.get(_enrollment_key(enrollment_id))
+    if enrollment is None:
+        from .models import StudentClassEnrollment
+        enrollment = StudentClassEnrollment.objects.select_related(
+            'student', 'classroom', 'classroom__course'
+        ).get(id=enrollment_id)
+        cache.set(_enrollment_key(enrollment_id), enrollment, SHARED_TTL)
+        # Seed the active flag without overwriting a concurrent invalidation
+        cache.add(_class_active_key(enrollment.classroom_id), enrollment.classroom.active, SHARED_TTL)
+
+    _enrollments.set(enrollment_id, enrollment)
+    return enrollment
+
+
+def remember_enrollment(enrollment):
+    """Prime both cache tiers with a freshly created enrollment."""
+    cache.set(_enrollment_key(enrollment.id), enrollment, SHARED_TTL)
+    _enrollments.set(enrollment.id, enrollment)
+
+
+def invalidate_enrollment(enrollment_id):
+    """Drop a single enrollment from both cache tiers."""
+    cache.delete(_enrollment_key(enrollment_id))
+    _enrollments.delete(enrollment_id)
+
+
+# -------- CLASS ACTIVE FLAGS --------
+def is_class_active(class_id):
+    """Return whether the class is still active, consulting the caches first."""
+    active = _class_active.get(class_id)
+    if active is not None:
+        return active
+
+    active = cache.get(_class_active_key(class_id))
+    if active is None:
+        from classes.models import Class
+        active = Class.objects.filter(id=class_id, active=True).exists()
+        cache.add(_class_active_key(class_id), active, SHARED_TTL)
+
+    _class_active.set(class_id, active)
+    return active
+
+
+def invalidate_class(class_id):
+    """
+    Revoke cached access for every student of a class.
+    Called when a class is ended; the inactive flag is written (not deleted)
+    so other workers stop authenticating its students on their next lookup.
+    """
+    from .models import StudentClassEnrollment
+
+    cache.set(_class_active_key(class_id), False, SHARED_TTL)
+    _class_active.set(class_id, False)
+
+    enrollment_ids = StudentClassEnrollment.objects.filter(
+        classroom_id=class_id
+    ).values_list('id', flat=True)
+    cache.delete_many([_enrollment_key(eid) for eid in enrollment_ids])
+    _enrollments.delete_where(lambda key, enrollment: enrollment.classroom_id == class_id)
@@ -11,6 +11,7 @@ from django.core.exceptions import ValidationError
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from .models import Student, StudentClassEnrollment
+from . import auth_cache
 
 
 class StudentToken:
@@ -35,43 +36,56 @@ class StudentToken:
     
     @staticmethod
     def decode_token(token):
-        """Decode and validate a student token."""
+        """
+        Decode and validate a student token.
+        Verified claims are cached per token (keyed by jti) and the enrollment
+        lookup goes through auth_cache, so repeat requests skip both the
+        signature check and the database.
+        """
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            
-            # Validate token type
-            if payload.get('token_type') != 'student':
-                raise AuthenticationFailed('Invalid token type')
-            
-            # Check if enrollment still exists and is valid
-            enrollment_id = payload.get('enrollment_id')
-            if not enrollment_id:
-                raise AuthenticationFailed('Invalid token')
-            
-            enrollment = StudentClassEnrollment.objects.select_related(
-                'student', 'classroom'
-            ).get(id=enrollment_id)
-            
-            # Check if class is still active
-            if not enrollment.classroom.active:
-                raise AuthenticationFailed('Class is no longer active')
-            
-            return {
-                'student_id': payload['student_id'],
-                'class_id': payload['class_id'],
-                'enrollment_id': payload['enrollment_id'],
-                'student': enrollment.student,
-                'classroom': enrollment.classroom,
-                'enrollment': enrollment
-            }
-            
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed('Token has expired')
+            unverified = jwt.decode(token, options={"verify_signature": False})
         except jwt.InvalidTokenError:
             raise AuthenticationFailed('Invalid token')
+
+        # Validate token type
+        if unverified.get('token_type') != 'student':
+            raise AuthenticationFailed('Invalid token type')
+
+        jti = unverified.get('jti')
+        payload = auth_cache.get_claims(jti, token) if jti else None
+        if payload is None:
+            try:
+                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            except jwt.ExpiredSignatureError:
+                raise AuthenticationFailed('Token has expired')
+            except jwt.InvalidTokenError:
+                raise AuthenticationFailed('Invalid token')
+            if jti:
+                auth_cache.remember_claims(jti, token, payload)
+
+        # Check if enrollment still exists and is valid
+        enrollment_id = payload.get('enrollment_id')
+        if not enrollment_id:
+            raise AuthenticationFailed('Invalid token')
+
+        try:
+            enrollment = auth_cache.get_enrollment(enrollment_id)
         except StudentClassEnrollment.DoesNotExist:
             raise AuthenticationFailed('Invalid enrollment')
 
+        # Check if class is still active
+        if not auth_cache.is_class_active(enrollment.classroom_id):
+            raise AuthenticationFailed('Class is no longer active')
+
+        return {
+            'student_id': payload['student_id'],
+            'class_id': payload['class_id'],
+            'enrollment_id': payload['enrollment_id'],
+            'student': enrollment.student,
+            'classroom': enrollment.classroom,
+            'enrollment': enrollment
+        }
+
 
 class StudentAuthentication(BaseAuthentication):
     """
@@ -90,18 +104,8 @@ class StudentAuthentication(BaseAuthentication):
             # Extract token from "Bearer <token>" format
             token = auth_header.split(' ')[1]
             
-            # Quick check: if token doesn't contain student info, skip
-            # This prevents JWT from trying to validate student tokens
-            import jwt
-            try:
-                # Decode without verification to check token type
-                unverified_payload = jwt.decode(token, options={"verify_signature": False})
-                if unverified_payload.get('token_type') != 'student':
-                    return None
-            except:
-                return None
-            
-            # Now properly validate the student token
+            # Validate the student token; non-student tokens (teacher JWTs)
+            # fail the token type check and fall through to JWTAuthentication
             token_data = StudentToken.decode_token(token)
             
             # Create a proper user object for students
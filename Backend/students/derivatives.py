@@ -0,0 +1,237 @@
+"""
+Thumbnails and previews of uploaded answers.
+
+A teacher reviewing a room's image upload or drawing answers should not
+download every full-size original. Once an answer with an uploaded file is
+committed it is queued here; a collector thread batches the queue and
+renders each file's variants (students.imaging) on a pool of spawned worker
+processes, so resampling never holds the web worker's GIL. The encoded
+variants are saved next to each other under a layout derived from the
+original's name:
+
+    student_uploads/photo.jpg -> derivatives/student_uploads/photo/thumb.webp
+                                 derivatives/student_uploads/photo/preview.webp
+
+and answer.derivatives_ready is set, which makes the answer serializers
+expose thumbnail_url and preview_url (served by students.media).
+
+Drawings submitted as vector strokes have no uploaded file: their full-size
+PNG and variants are rasterized on the same worker pool when first requested
+(stroke_raster), and kept under derivatives/strokes/.
+"""
+import base64
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from classpoint_backend.batching import BatchQueue
+from quizzes.constants import ValidationLimits
+from .imaging import FORMAT_EXTENSIONS, render_variants
+from .strokes import render_png
+from .models import StudentAnswer
+
+logger = logging.getLogger(__name__)
+
+
+_config = getattr(settings, 'ANSWER_DERIVATIVES', {})
+VARIANTS = _config.get('VARIANTS', {'thumb': 320, 'preview': 1280})
+IMAGE_FORMAT = _config.get('FORMAT', 'WEBP').upper()
+QUALITY = _config.get('QUALITY', 80)
+WORKERS = _config.get('WORKERS', 2)
+BATCH_SIZE = _config.get('BATCH_SIZE', 50)
+FLUSH_INTERVAL = _config.get('FLUSH_INTERVAL', 0.5)
+RUN_IN_BACKGROUND = _config.get('ASYNC', True)
+
+# Stroke drawings are re-validated against these when rasterized
+_strokes_config = getattr(settings, 'DRAWING_STROKES', {})
+STROKE_MAX_WIDTH = _strokes_config.get('MAX_WIDTH', 64)
+STROKE_MAX_INK = _strokes_config.get('MAX_INK', 20)
+
+DERIVATIVES_ROOT = 'derivatives'
+
+
+def derivative_name(file_name, variant):
+    """Storage name of one variant of an uploaded file."""
+    stem, _ = os.path.splitext(file_name)
+    return f'{DERIVATIVES_ROOT}/{stem}/{variant}.{FORMAT_EXTENSIONS[IMAGE_FORMAT]}'
+
+
+def _render_source(field_file):
+    """Local path of a stored file, or its bytes for storages without paths."""
+    try:
+        return field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        with field_file.storage.open(field_file.name, 'rb') as source:
+            return source.read()
+
+
+class DerivativePipeline:
+    """Collects answers with uploaded files and renders their variants on a process pool."""
+
+    def __init__(self, workers=WORKERS, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 run_in_background=RUN_IN_BACKGROUND):
+        self.workers = workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._batches = BatchQueue(
+            self._dispatch,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            run_in_background=run_in_background,
+            name='derivatives-collector',
+        )
+
+    def enqueue(self, answer_ids):
+        """Queue answers whose uploaded files need variants."""
+        for answer_id in answer_ids:
+            self._batches.put(answer_id)
+
+    def flush(self):
+        """Render everything queued so far, waiting for the results."""
+        self._batches.flush()
+
+    def render(self, answers, force=False):
+        """
+        Render and store the variants of the given answers; returns the ids
+        that succeeded. Answers whose (content-addressed, so possibly shared)
+        file already has every variant are marked ready without rendering,
+        unless force is set.
+        """
+        jobs = []
+        ready = []
+        sharing = {}  # file name -> ids of further answers in this batch with that file
+        for answer in answers:
+            name = answer.uploaded_file.name
+            if name in sharing:
+                sharing[name].append(answer.id)
+                continue
+            if not force and _has_variants(name):
+                ready.append(answer.id)
+                continue
+            try:
+                source = _render_source(answer.uploaded_file)
+            except OSError:
+                logger.warning('Uploaded file of answer %s is missing', answer.id)
+                continue
+            sharing[name] = []
+            jobs.append((answer, self.submit(render_variants, source, VARIANTS, IMAGE_FORMAT, QUALITY)))
+
+        for answer, future in jobs:
+            try:
+                rendered = future.result()
+                self._store(answer, rendered)
+            except Exception:
+                logger.warning('Could not render variants of answer %s', answer.id, exc_info=True)
+                continue
+            ready.append(answer.id)
+            ready.extend(sharing[answer.uploaded_file.name])
+
+        if ready:
+            StudentAnswer.objects.filter(id__in=ready).update(derivatives_ready=True)
+        return ready
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the worker pool (or inline without workers); returns a Future."""
+        if not self.workers:
+            # Render on the calling thread
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        return self._pool().submit(fn, *args)
+
+    def _pool(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # Spawned (not forked) workers: the web process runs threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+        return self._executor
+
+    def _dispatch(self, batch):
+        answers = StudentAnswer.objects.filter(id__in=set(batch)).exclude(
+            uploaded_file=''
+        ).exclude(uploaded_file__isnull=True).only('id', 'uploaded_file')
+        self.render(answers)
+
+    @staticmethod
+    def _store(answer, rendered):
+        # Plain default storage: variants keep their predictable names
+        for variant, data in rendered.items():
+            name = derivative_name(answer.uploaded_file.name, variant)
+            # Re-rendering replaces the variant under its predictable name
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(data))
+
+
+def _has_variants(file_name):
+    return all(default_storage.exists(derivative_name(file_name, variant)) for variant in VARIANTS)
+
+
+def delete_derivatives(file_name):
+    """Remove every variant of an uploaded file."""
+    for variant in VARIANTS:
+        default_storage.delete(derivative_name(file_name, variant))
+
+
+def has_strokes(answer):
+    """True for drawing answers submitted as vector strokes (students.strokes)."""
+    return isinstance(answer.answer_data, dict) and 'strokes' in answer.answer_data
+
+
+def stroke_raster_name(answer_data, variant=None):
+    """Storage name of a stroke drawing rendered at full canvas size, or as a variant."""
+    key = hashlib.sha256(
+        f"{answer_data['canvas_width']}x{answer_data['canvas_height']}:{answer_data['strokes']}".encode()
+    ).hexdigest()
+    return f'{DERIVATIVES_ROOT}/strokes/{key[:2]}/{key}/{variant or "full"}.png'
+
+
+def stroke_raster(answer, variant=None):
+    """
+    Storage name of a PNG rendering of a stroke drawing. Strokes are only
+    rasterized when first requested; the PNG is kept for later requests.
+    """
+    name = stroke_raster_name(answer.answer_data, variant)
+    if not default_storage.exists(name):
+        width, height = answer.answer_data['canvas_width'], answer.answer_data['canvas_height']
+        # Canvases of quizzes saved before their size was capped are scaled down to it
+        longest = ValidationLimits.MAX_CANVAS_SIZE if variant is None else VARIANTS[variant]
+        scale = min(1.0, longest / max(width, height))
+        # On the worker pool, like uploaded files' variants: the request only waits
+        png = derivative_pipeline.submit(
+            render_png, base64.b64decode(answer.answer_data['strokes']), width, height, scale,
+            STROKE_MAX_WIDTH, STROKE_MAX_INK
+        ).result()
+        saved = default_storage.save(name, ContentFile(png))
+        if saved != name:
+            # Another request rendered it first
+            default_storage.delete(saved)
+    return name
+
+
+def delete_stroke_rasters(answer_data):
+    """Remove every cached rendering of a stroke drawing."""
+    for variant in (None, *VARIANTS):
+        default_storage.delete(stroke_raster_name(answer_data, variant))
+
+
+derivative_pipeline = DerivativePipeline()
+
+
+def schedule_derivatives(answers):
+    """Queue thumbnail/preview rendering for answers with files once the transaction commits."""
+    answer_ids = [answer.id for answer in answers if answer.uploaded_file]
+    if answer_ids:
+        transaction.on_commit(lambda: derivative_pipeline.enqueue(answer_ids))
@@ -0,0 +1,157 @@
+"""
+Asynchronous grading of student answers.
+
+Newly created answers are queued after their transaction commits. A
+background collector groups them by quiz and hands each group to a small
+worker pool; every group loads its quiz once, precomputes the grading
+tables, and writes the scores back with a single bulk_update. Submitting
+an answer never waits for grading.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from classpoint_backend.batching import BatchQueue
+from quizzes.constants import QuizTypeCodes
+from quizzes.helpers import QuizGradingHelper
+from quizzes.models import Quiz
+from quizzes.rules import get_quiz_rules
+from quizzes.statistics import invalidate_statistics
+from .models import StudentQuizSubmission, StudentAnswer
+
+
+_config = getattr(settings, 'GRADING', {})
+WORKERS = _config.get('WORKERS', 2)
+BATCH_SIZE = _config.get('BATCH_SIZE', 500)
+FLUSH_INTERVAL = _config.get('FLUSH_INTERVAL', 0.2)
+RUN_IN_BACKGROUND = _config.get('ASYNC', True)
+
+GRADABLE_QUIZ_TYPES = (QuizTypeCodes.MULTIPLE_CHOICE, QuizTypeCodes.SHORT_ANSWER)
+SCORE_PLACES = Decimal('0.01')
+
+
+class QuizGrader:
+    """
+    Grades answers of one quiz against its compiled rules (quizzes.rules),
+    so the grading tables are built once per quiz version. Scores are
+    normalized to the 0-1 range.
+    """
+
+    def __init__(self, quiz):
+        self.quiz_type = quiz.quiz_type
+        self.rules = get_quiz_rules(quiz)
+
+    @property
+    def gradable(self):
+        return self.quiz_type in GRADABLE_QUIZ_TYPES
+
+    def score(self, answer_data):
+        """Return the normalized score for one answer, or None if it cannot be graded."""
+        answer_data = answer_data or {}
+
+        if self.quiz_type == QuizTypeCodes.MULTIPLE_CHOICE:
+            result = QuizGradingHelper.grade_multiple_choice_indices(
+                answer_data.get('selected_choice_indices', []),
+                self.rules.correct_indices,
+                self.rules.allow_multiple
+            )
+            raw = result['score']
+            if self.rules.allow_multiple:
+                # Multiple-answer questions give one point per net correct pick
+                raw = min(1, raw / max(1, len(self.rules.correct_indices)))
+
+        elif self.quiz_type == QuizTypeCodes.SHORT_ANSWER:
+            result = QuizGradingHelper.grade_short_answer_matched(
+                str(answer_data.get('answer_text', '')),
+                self.rules.correct_answer,
+                self.rules.keyword_matcher,
+                self.rules.case_sensitive,
+                self.rules.correct_answer_pattern
+            )
+            raw = result['score']
+
+        else:
+            return None
+
+        return Decimal(str(raw)).quantize(SCORE_PLACES, rounding=ROUND_HALF_UP)
+
+
+def grade_quiz_answers(quiz, answer_ids):
+    """
+    Grade the given answers of one quiz and store the scores on their
+    submissions. Returns the number of submissions updated.
+    """
+    grader = QuizGrader(quiz)
+    if not grader.gradable:
+        return 0
+
+    rows = StudentAnswer.objects.filter(
+        id__in=answer_ids, submission__quiz=quiz
+    ).values_list('submission_id', 'answer_data')
+
+    submissions = []
+    for submission_id, answer_data in rows:
+        score = grader.score(answer_data)
+        if score is not None:
+            submissions.append(StudentQuizSubmission(id=submission_id, score=score))
+
+    StudentQuizSubmission.objects.bulk_update(submissions, ['score'], batch_size=BATCH_SIZE)
+    if submissions:
+        invalidate_statistics(quiz.id, quiz.course_id)
+    return len(submissions)
+
+
+class GradingPipeline:
+    """Collects newly created answers and grades them per quiz on a worker pool."""
+
+    def __init__(self, workers=WORKERS, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 run_in_background=RUN_IN_BACKGROUND):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='grading')
+        self._batches = BatchQueue(
+            self._dispatch,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            run_in_background=run_in_background,
+            name='grading-collector',
+        )
+
+    def enqueue(self, quiz_id, answer_ids):
+        """Queue answers of one quiz for grading."""
+        for answer_id in answer_ids:
+            self._batches.put((quiz_id, answer_id))
+
+    def flush(self):
+        """Grade everything queued so far on the calling thread."""
+        self._batches.flush()
+
+    def _dispatch(self, batch):
+        by_quiz = {}
+        for quiz_id, answer_id in batch:
+            by_quiz.setdefault(quiz_id, []).append(answer_id)
+
+        # Wait for the group so the collector never runs ahead of the pool
+        futures = [
+            self._executor.submit(self._grade_group, quiz_id, answer_ids)
+            for quiz_id, answer_ids in by_quiz.items()
+        ]
+        for future in futures:
+            future.result()
+
+    def _grade_group(self, quiz_id, answer_ids):
+        close_old_connections()
+        quiz = Quiz.objects.filter(id=quiz_id).first()
+        if quiz is not None:
+            grade_quiz_answers(quiz, answer_ids)
+
+
+grading_pipeline = GradingPipeline()
+
+
+def schedule_grading(quiz, answers):
+    """Queue answers for grading once the current transaction commits."""
+    if quiz.quiz_type not in GRADABLE_QUIZ_TYPES:
+        # Nothing to grade, but submission counts still changed
+        transaction.on_commit(lambda: invalidate_statistics(quiz.id, quiz.course_id))
+        return
+    answer_ids = [answer.id for answer in answers]
+    transaction.on_commit(lambda: grading_pipeline.enqueue(quiz.id, answer_ids))
@@ -0,0 +1,62 @@
+"""
+Pillow rendering of answer thumbnails and previews.
+
+This module deliberately imports nothing from Django: its functions run in
+spawned worker processes (students.derivatives) that never set Django up.
+"""
+import io
+from PIL import Image, ImageOps
+
+
+# Pillow save format -> file extension
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def render_variants(source, variants, image_format='WEBP', quality=80):
+    """
+    Downscale an image to each variant's bounding box and encode it.
+
+    source is a file path or the image bytes; variants maps a variant name
+    to the longest side in pixels. Returns {variant name: encoded bytes}.
+    Larger variants are rendered first and each smaller one is resized from
+    the previous result, so the full-size image is only resampled once.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    with Image.open(source) as original:
+        largest = max(variants.values())
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale, far cheaper than a full decode
+        original.draft('RGB', (largest, largest))
+        # exif_transpose returns a copy, so resizing in place never touches the original
+        image = ImageOps.exif_transpose(original)
+        image = _normalize_mode(image, image_format)
+
+        rendered = {}
+        for name, size in sorted(variants.items(), key=lambda item: -item[1]):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            output = io.BytesIO()
+            options = {'quality': quality}
+            if image_format == 'JPEG':
+                options.update(optimize=True, progressive=True)
+            else:
+                options.update(method=4)
+            image.save(output, image_format, **options)
+            rendered[name] = output.getvalue()
+        return rendered
+
+
+def _normalize_mode(image, image_format):
+    """Convert palette / CMYK / 16-bit images to a mode the target format encodes."""
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if image_format == 'JPEG':
+        if has_alpha:
+            # JPEG has no alpha: flatten onto white like the canvas students drew on
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            return background
+        return image if image.mode == 'RGB' else image.convert('RGB')
+    if has_alpha:
+        return image if image.mode == 'RGBA' else image.convert('RGBA')
+    return image if image.mode == 'RGB' else image.convert('RGB')
@@ -0,0 +1,206 @@
+"""
+Batched answer ingestion for burst submissions.
+
+When a teacher says "submit now", hundreds of answers arrive within a couple
+of seconds. Instead of validating and inserting each one in its own request,
+answers are queued and flushed in micro-batches:
+
+- each quiz is loaded once per batch,
+- duplicate answers are detected in memory against the preloaded set of
+  students who already answered,
+- submissions and answers are inserted with bulk_create in one transaction.
+
+Clients receive a receipt immediately and poll it to confirm persistence.
+Neither the queue nor the receipts are durable:
+
+- queued answers are held in the worker's memory until flushed, so an answer
+  accepted with a 202 is lost if that worker stops or restarts before the
+  next flush; clients should resubmit when the receipt never reaches
+  "persisted";
+- receipts live in the configured Django cache. The default (CACHE_BACKEND
+  locmem) is per process, so a receipt is only found by the worker that
+  issued it and is polled as 404 on any other; run several workers only
+  with a shared backend (redis or memcached).
+"""
+import logging
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from classpoint_backend.batching import BatchQueue
+from quizzes.models import Quiz
+from live.aggregation import record_answers
+from live.events import publish_answer_created
+from .grading import schedule_grading
+from .models import StudentQuizSubmission, StudentAnswer
+from .serializers import ANSWER_SERIALIZERS
+
+logger = logging.getLogger(__name__)
+
+_config = getattr(settings, 'ANSWER_INGESTION', {})
+BATCH_SIZE = _config.get('BATCH_SIZE', 200)
+FLUSH_INTERVAL = _config.get('FLUSH_INTERVAL', 0.05)
+RECEIPT_TTL = _config.get('RECEIPT_TTL', 3600)
+RUN_IN_BACKGROUND = _config.get('ASYNC', True)
+
+# Uploads need the regular multipart create path
+QUEUEABLE_QUIZ_TYPES = ('short_answer', 'word_cloud', 'multiple_choice')
+
+QUEUED = 'queued'
+PERSISTED = 'persisted'
+REJECTED = 'rejected'
+
+
+def _receipt_key(receipt_id):
+    return f'students:answer-receipt:{receipt_id}'
+
+
+def get_receipt(receipt_id):
+    """
+    Return the stored receipt dict, or None if unknown, expired, or issued by
+    another worker while the cache is per process (see the module docstring).
+    """
+    return cache.get(_receipt_key(receipt_id))
+
+
+def _set_receipt(item, status, **extra):
+    cache.set(_receipt_key(item.receipt_id), {
+        'receipt_id': item.receipt_id,
+        'student_id': item.student.id,
+        'quiz_id': item.quiz_id,
+        'status': status,
+        **extra,
+    }, RECEIPT_TTL)
+
+
+class PendingAnswer:
+    """One queued answer and who submitted it."""
+
+    __slots__ = ('receipt_id', 'student', 'classroom_id', 'quiz_id', 'payload')
+
+    def __init__(self, student, classroom_id, quiz_id, payload):
+        self.receipt_id = uuid.uuid4().hex
+        self.student = student
+        self.classroom_id = classroom_id
+        self.quiz_id = quiz_id
+        self.payload = payload
+
+
+class AnswerIngestionQueue:
+    """
+    Queue of pending answers drained in micro-batches by a background
+    flusher thread, which starts lazily on the first submission.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 run_in_background=RUN_IN_BACKGROUND):
+        self._batches = BatchQueue(
+            self._process,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            run_in_background=run_in_background,
+            name='answer-ingestion',
+        )
+
+    def submit(self, student, classroom_id, quiz_id, payload):
+        """Queue an answer and return its receipt id."""
+        item = PendingAnswer(student, classroom_id, quiz_id, payload)
+        _set_receipt(item, QUEUED)
+        self._batches.put(item)
+        return item.receipt_id
+
+    def flush(self):
+        """Drain and persist everything currently queued."""
+        self._batches.flush()
+
+    def _process(self, batch):
+        by_quiz = {}
+        for item in batch:
+            by_quiz.setdefault(item.quiz_id, []).append(item)
+
+        for quiz_id, items in by_quiz.items():
+            try:
+                self._process_quiz(quiz_id, items)
+            except Exception:
+                logger.exception('Answer ingestion failed for quiz %s', quiz_id)
+                for item in items:
+                    _set_receipt(item, REJECTED, errors=['Answer could not be saved. Please resubmit.'])
+
+    def _process_quiz(self, quiz_id, items):
+        quiz = Quiz.objects.filter(id=quiz_id).first()
+        if quiz is None or quiz.quiz_type not in QUEUEABLE_QUIZ_TYPES:
+            for item in items:
+                _set_receipt(item, REJECTED, errors=['Invalid quiz ID'])
+            return
+
+        serializer_class = ANSWER_SERIALIZERS[quiz.quiz_type]
+        student_ids = {item.student.id for item in items}
+        submissions = {
+            submission.student_id: submission
+            for submission in StudentQuizSubmission.objects.filter(quiz=quiz, student_id__in=student_ids)
+        }
+        answered = set(
+            StudentAnswer.objects.filter(
+                submission__quiz=quiz, submission__student_id__in=student_ids
+            ).values_list('submission__student_id', flat=True)
+        )
+
+        accepted = []
+        for item in items:
+            if item.student.id in answered:
+                _set_receipt(item, REJECTED, errors=['You have already answered this quiz.'])
+                continue
+
+            # No request in context: duplicates were checked above, in memory
+            serializer = serializer_class(data=item.payload, context={'quiz': quiz})
+            if not serializer.is_valid():
+                _set_receipt(item, REJECTED, errors=serializer.errors)
+                continue
+
+            answered.add(item.student.id)
+            accepted.append((item, serializer.validated_data['answer_data']))
+
+        if not accepted:
+            return
+
+        try:
+            self._persist(quiz, submissions, accepted)
+        except IntegrityError:
+            # A concurrent request answered for one of these students; retry one by one
+            for item, answer_data in accepted:
+                try:
+                    self._persist(quiz, submissions, [(item, answer_data)])
+                except IntegrityError:
+                    _set_receipt(item, REJECTED, errors=['You have already answered this quiz.'])
+
+    @transaction.atomic
+    def _persist(self, quiz, submissions, accepted):
+        new_submissions = [
+            StudentQuizSubmission(student=item.student, quiz=quiz, score=None, is_late=False)
+            for item, _ in accepted
+            if item.student.id not in submissions
+        ]
+        StudentQuizSubmission.objects.bulk_create(new_submissions)
+        batch_submissions = {
+            **submissions,
+            **{submission.student_id: submission for submission in new_submissions},
+        }
+
+        answers = [
+            StudentAnswer(submission=batch_submissions[item.student.id], answer_data=answer_data)
+            for item, answer_data in accepted
+        ]
+        StudentAnswer.objects.bulk_create(answers)
+        record_answers(quiz, answers)
+        schedule_grading(quiz, answers)
+        # Only remember new submissions once every insert has succeeded
+        submissions.update(batch_submissions)
+
+        for (item, _), answer in zip(accepted, answers):
+            publish_answer_created(answer, quiz, item.student, classroom_id=item.classroom_id)
+            transaction.on_commit(
+                lambda item=item, answer=answer: _set_receipt(item, PERSISTED, answer_id=answer.id)
+            )
+
+
+ingestion_queue = AnswerIngestionQueue()
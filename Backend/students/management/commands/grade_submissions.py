@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from quizzes.models import Quiz
+from students.grading import GRADABLE_QUIZ_TYPES, grade_quiz_answers
+from students.models import StudentAnswer
+
+
+class Command(BaseCommand):
+    help = 'Grade stored multiple choice and short answer submissions (ungraded only by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quiz',
+            type=int,
+            action='append',
+            dest='quiz_ids',
+            help='Quiz ID to grade (repeatable; default: all gradable quizzes)'
+        )
+        parser.add_argument(
+            '--regrade',
+            action='store_true',
+            help='Regrade submissions that already have a score'
+        )
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.filter(quiz_type__in=GRADABLE_QUIZ_TYPES).order_by('id')
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(id__in=options['quiz_ids'])
+
+        total = 0
+        for quiz in quizzes.iterator():
+            answers = StudentAnswer.objects.filter(submission__quiz=quiz)
+            if not options['regrade']:
+                answers = answers.filter(submission__score__isnull=True)
+            graded = grade_quiz_answers(quiz, list(answers.values_list('id', flat=True)))
+            if graded:
+                total += graded
+                self.stdout.write(f"  - {quiz.title} (#{quiz.id}): {graded} submission(s)")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Graded {total} submission(s)'))
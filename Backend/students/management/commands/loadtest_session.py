@@ -0,0 +1,267 @@
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from classes.models import Class
+from courses.models import Course
+from quizzes.models import Quiz
+from students.models import Student
+
+
+JOIN = 'POST /api/students/join/'
+LIST = 'GET /api/students/quizzes/'
+ANSWER = 'POST /api/students/answers/'
+
+QUIZZES = [
+    ('multiple_choice', {
+        'question_text': 'Which planet is closest to the sun?',
+        'choices': [
+            {'text': 'Mercury', 'is_correct': True},
+            {'text': 'Venus'},
+            {'text': 'Mars'},
+            {'text': 'Jupiter'},
+        ],
+    }),
+    ('short_answer', {
+        'question_text': 'Why do we have seasons?',
+        'correct_answer': 'axial tilt',
+        'expected_keywords': 'tilt, axis, orbit, sun',
+    }),
+    ('word_cloud', {
+        'question_text': 'One word that describes today',
+        'max_words_per_student': 3,
+    }),
+]
+
+
+def answer_payload(quiz_id, quiz_type, student_number):
+    """A valid answer for the given quiz type, varied per student."""
+    if quiz_type == 'multiple_choice':
+        return {'quiz_id': quiz_id, 'selected_choice_indices': [student_number % 4]}
+    if quiz_type == 'short_answer':
+        return {'quiz_id': quiz_id, 'answer_text': 'the tilt of the axis as we orbit the sun'[: 10 + student_number % 30]}
+    words = ['sunny', 'tired', 'busy', 'great', 'cold', 'calm']
+    return {'quiz_id': quiz_id, 'answer_text': ', '.join(words[(student_number + i) % len(words)] for i in range(3))}
+
+
+class TestClientTransport:
+    """Drives the views in-process through the DRF test client; counts queries per request."""
+
+    def __init__(self):
+        # Server errors are recorded as 500s instead of aborting the run
+        self.client = APIClient(raise_request_exception=False)
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def request(self, method, path, body=None):
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'GET':
+                response = self.client.get(path)
+            else:
+                response = self.client.post(path, body, format='json')
+        try:
+            data = response.json() if response.content else None
+        except ValueError:
+            data = None
+        return response.status_code, data, len(response.content), len(queries.captured_queries)
+
+
+class HttpTransport:
+    """Drives a running server over HTTP; query counts are not available."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.token = None
+
+    def authenticate(self, token):
+        self.token = token
+
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, content = e.code, e.read()
+        try:
+            payload = json.loads(content) if content else None
+        except ValueError:
+            payload = None
+        return status, payload, len(content), None
+
+
+class Recorder:
+    """Thread-safe per-endpoint samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, endpoint, seconds, status, queries):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((seconds, status, queries))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate a live classroom burst: N students join a class, list its quizzes and answer them '
+        'concurrently. Reports p50/p95/p99 latency, throughput and DB queries per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--students',
+            type=int,
+            default=100,
+            help='Number of simulated students (default: 100)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Students running at the same time (default: 20)'
+        )
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            default=None,
+            help='Drive a running server (e.g. http://localhost:8000) instead of the in-process test client. '
+                 'The server must use the same database as this command.'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the generated teacher, course, class, quizzes and students'
+        )
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        teacher, course, classroom, quizzes = self.create_session(run_id)
+        self.stdout.write(
+            f"Session {run_id}: class {classroom.code}, {len(quizzes)} quizzes, "
+            f"{options['students']} students, concurrency {options['concurrency']}"
+        )
+
+        if options['base_url']:
+            make_transport = lambda: HttpTransport(options['base_url'])
+        else:
+            make_transport = TestClientTransport
+
+        recorder = Recorder()
+        student_ids = []
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='loadtest') as pool:
+                futures = [
+                    pool.submit(self.run_student, make_transport(), recorder, run_id, number, classroom.code, quizzes)
+                    for number in range(options['students'])
+                ]
+                for future in futures:
+                    student_id = future.result()
+                    if student_id:
+                        student_ids.append(student_id)
+            elapsed = time.perf_counter() - started
+            self.report(recorder, elapsed, counts_queries=options['base_url'] is None)
+        finally:
+            if not options['keep']:
+                self.cleanup(teacher, course, classroom, student_ids)
+
+    @staticmethod
+    def create_session(run_id):
+        teacher = User.objects.create_user(username=f'loadtest-{run_id}', password=None)
+        course = Course.objects.create(name=f'Load test {run_id}', teacher=teacher)
+        classroom = Class.objects.create(course=course, teacher=teacher, active=True)
+        quizzes = [
+            (Quiz.objects.create(
+                course=course, title=f'{quiz_type} ({run_id})', quiz_type=quiz_type,
+                properties=properties, created_by=teacher
+            ).id, quiz_type)
+            for quiz_type, properties in QUIZZES
+        ]
+        return teacher, course, classroom, quizzes
+
+    @staticmethod
+    def run_student(transport, recorder, run_id, number, class_code, quizzes):
+        """One student's session: join, list quizzes, answer each quiz. Returns the student id."""
+        def timed(endpoint, method, path, body=None):
+            start = time.perf_counter()
+            status, data, _, queries = transport.request(method, path, body)
+            recorder.add(endpoint, time.perf_counter() - start, status, queries)
+            return status, data
+
+        try:
+            status, data = timed(JOIN, 'POST', '/api/students/join/', {
+                'full_name': f'Load {run_id} #{number}',
+                'class_code': class_code,
+            })
+            if status not in (200, 201) or not data or not data.get('access_token'):
+                return None
+            transport.authenticate(data['access_token'])
+
+            timed(LIST, 'GET', '/api/students/quizzes/')
+            for quiz_id, quiz_type in quizzes:
+                timed(ANSWER, 'POST', '/api/students/answers/', answer_payload(quiz_id, quiz_type, number))
+            return data.get('student_id')
+        finally:
+            # Worker threads own their connections
+            connections.close_all()
+
+    def report(self, recorder, elapsed, counts_queries):
+        header = (
+            f"{'endpoint':<30} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'req/s':>8} {'queries':>8}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        total = 0
+        for endpoint in (JOIN, LIST, ANSWER):
+            samples = recorder.samples.get(endpoint, [])
+            if not samples:
+                continue
+            total += len(samples)
+            latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+            errors = sum(1 for _, status, _ in samples if status >= 400)
+            if counts_queries:
+                queries = f"{sum(q for _, _, q in samples) / len(samples):>8.1f}"
+            else:
+                queries = f"{'n/a':>8}"
+            self.stdout.write(
+                f"{endpoint:<30} {len(samples):>8} {errors:>6} {percentile(latencies, 0.50):>8.1f} "
+                f"{percentile(latencies, 0.95):>8.1f} {percentile(latencies, 0.99):>8.1f} "
+                f"{len(samples) / elapsed:>8.1f} {queries}"
+            )
+        self.stdout.write('-' * len(header))
+        self.stdout.write(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s); queries are averages per request")
+        self.stdout.write(self.style.SUCCESS('✅ Load test complete'))
+
+    def cleanup(self, teacher, course, classroom, student_ids):
+        # End the class so its join code returns to the pool
+        classroom.active = False
+        classroom.save()
+        # Quizzes protect their creator, so the course (and its quizzes and classes) goes first
+        course.delete()
+        Student.objects.filter(id__in=student_ids).delete()
+        teacher.delete()
+        self.stdout.write(f"Removed generated data ({len(student_ids)} students)")
@@ -0,0 +1,73 @@
+import os
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from students.derivatives import delete_derivatives
+from students.models import StoredFile, StudentAnswer
+from students.storage import answer_upload_storage
+
+
+class Command(BaseCommand):
+    help = 'Move answer uploads saved under plain names into the content-addressed layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Answers rehomed per transaction (default: 200)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the answers whose files would be rehomed'
+        )
+
+    def handle(self, *args, **options):
+        storage = answer_upload_storage()
+        tracked = set(StoredFile.objects.values_list('name', flat=True))
+        answers = StudentAnswer.objects.exclude(uploaded_file='').exclude(
+            uploaded_file__isnull=True
+        ).only('id', 'uploaded_file').order_by('id')
+
+        pending = [answer for answer in answers.iterator(chunk_size=options['batch_size'])
+                   if answer.uploaded_file.name not in tracked]
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(pending)} answer upload(s) would be rehomed'))
+            return
+
+        moved = missing = 0
+        for start in range(0, len(pending), options['batch_size']):
+            batch = pending[start:start + options['batch_size']]
+            rehomed, old_names = [], set()
+            with transaction.atomic():
+                for answer in batch:
+                    old_name = answer.uploaded_file.name
+                    try:
+                        new_name = storage.adopt(old_name)
+                    except FileNotFoundError:
+                        missing += 1
+                        continue
+                    if new_name == old_name:
+                        continue
+                    answer.uploaded_file.name = new_name
+                    answer.derivatives_ready = False
+                    rehomed.append(answer)
+                    old_names.add(old_name)
+                StudentAnswer.objects.bulk_update(rehomed, ['uploaded_file', 'derivatives_ready'])
+                # The hashed copies are referenced: drop the old names once that is durable
+                transaction.on_commit(lambda names=old_names: self._remove(storage, names))
+            moved += len(rehomed)
+            self.stdout.write(f"  - {moved} rehomed, {missing} missing")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rehomed {moved} answer upload(s), {missing} missing'))
+        if moved:
+            self.stdout.write('Run render_answer_derivatives to render thumbnails for the new names')
+
+    @staticmethod
+    def _remove(storage, names):
+        for name in names:
+            delete_derivatives(name)
+            try:
+                os.remove(storage.path(name))
+            except FileNotFoundError:
+                pass
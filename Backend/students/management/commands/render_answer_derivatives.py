@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from students.derivatives import derivative_pipeline
+from students.models import StudentAnswer
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnails and previews of uploaded answer files (missing ones only by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quiz',
+            type=int,
+            action='append',
+            dest='quiz_ids',
+            help='Quiz ID whose answers to render (repeatable; default: all quizzes)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Answers handed to the worker pool at a time (default: 100)'
+        )
+        parser.add_argument(
+            '--rerender',
+            action='store_true',
+            help='Render answers that already have thumbnails again'
+        )
+
+    def handle(self, *args, **options):
+        answers = StudentAnswer.objects.exclude(uploaded_file='').exclude(
+            uploaded_file__isnull=True
+        ).only('id', 'uploaded_file').order_by('id')
+        if options['quiz_ids']:
+            answers = answers.filter(submission__quiz_id__in=options['quiz_ids'])
+        if not options['rerender']:
+            answers = answers.filter(derivatives_ready=False)
+
+        total = failed = 0
+        batch = []
+        for answer in answers.iterator(chunk_size=options['batch_size']):
+            batch.append(answer)
+            if len(batch) >= options['batch_size']:
+                rendered = len(derivative_pipeline.render(batch, force=options['rerender']))
+                total, failed = total + rendered, failed + len(batch) - rendered
+                self.stdout.write(f"  - {total} rendered, {failed} failed")
+                batch = []
+        if batch:
+            rendered = len(derivative_pipeline.render(batch, force=options['rerender']))
+            total, failed = total + rendered, failed + len(batch) - rendered
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rendered thumbnails for {total} answer(s), {failed} failed'))
@@ -0,0 +1,195 @@
+"""
+Access-checked serving of answer files.
+
+Uploaded answers are students' work, so MEDIA_URL (only routed while DEBUG)
+is not how they are served. GET /api/students/answers/<id>/file/ (and
+?variant=thumb|preview for the rendered derivatives) checks access, then:
+
+- with PROTECTED_MEDIA['SENDFILE'] set, answers with an X-Accel-Redirect or
+  X-Sendfile header and an empty body: the web server sends the bytes,
+  including Range requests, and the worker is free at once;
+- otherwise streams the file with FileResponse (which the WSGI server can
+  hand to sendfile()), or the requested byte range with a 206.
+
+Either way the response carries an ETag, Last-Modified and long-lived
+Cache-Control. Originals are content-addressed (students.storage), so their
+ETag is the content hash and they are cached as immutable.
+
+Access is granted to the answer's student and the course's teacher, or to
+anyone holding a signed URL. Serializers hand signed URLs to those two only
+(never to the unauthenticated ?student_id= listing), so their <img> tags,
+which cannot send a bearer token, can load them; a signature binds the
+answer and variant, and expires between URL_TTL and 2 x URL_TTL seconds after
+it was issued (expiries are rounded so URLs stay stable, and cacheable, for a
+while).
+"""
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import quote, urlencode
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signing import Signer
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+
+
+_config = getattr(settings, 'PROTECTED_MEDIA', {})
+SENDFILE = _config.get('SENDFILE', '')
+ACCEL_PREFIX = _config.get('ACCEL_PREFIX', '/protected-media/')
+URL_TTL = _config.get('URL_TTL', 6 * 3600)
+MAX_AGE = _config.get('MAX_AGE', 365 * 24 * 3600)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CONTENT_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+_signer = Signer(salt='students.media')
+
+
+def _signed_value(answer_id, variant, expires):
+    return f'{answer_id}:{variant or ""}:{expires}'
+
+
+def can_access(user, answer):
+    """True for the answer's student and the teacher of the quiz's course."""
+    from .authentication import StudentUser
+
+    if isinstance(user, StudentUser):
+        return answer.submission.student_id == user.student.id
+    if isinstance(user, User):
+        return answer.submission.quiz.course.teacher_id == user.id
+    return False
+
+
+def answer_file_url(request, answer, variant=None):
+    """
+    Signed absolute URL of an answer's file or one of its variants, or None
+    unless the requester may access the answer (see can_access): a signed
+    URL grants access to whoever holds it.
+    """
+    if request is None or not can_access(request.user, answer):
+        return None
+    expires = (int(time.time()) // URL_TTL + 2) * URL_TTL
+    signature = _signer.signature(_signed_value(answer.id, variant, expires))
+    params = {'variant': variant} if variant else {}
+    params.update(expires=expires, signature=signature)
+    url = f"{reverse('answer-file', kwargs={'pk': answer.id})}?{urlencode(params)}"
+    return request.build_absolute_uri(url)
+
+
+def signature_valid(answer_id, variant, params):
+    """True when params carry an unexpired signature for this answer and variant."""
+    try:
+        expires = int(params.get('expires', ''))
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    expected = _signer.signature(_signed_value(answer_id, variant, expires))
+    return constant_time_compare(expected, params.get('signature', ''))
+
+
+def file_etag(storage, name, immutable):
+    """Content hash of content-addressed files, else size and modification time."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if immutable and CONTENT_HASH_RE.match(stem):
+        return f'"{stem}"'
+    return f'"{storage.size(name):x}-{int(storage.get_modified_time(name).timestamp()):x}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, end inclusive; None when the
+    whole file should be sent (no, or a multi-part, range). Raises
+    ValueError when the range cannot be satisfied, as any range of an empty
+    file.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        raise ValueError('Empty file has no satisfiable range')
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _read_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, storage, name, immutable=False):
+    """Response sending a stored file, honouring conditional and Range requests."""
+    etag = file_etag(storage, name, immutable)
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, storage, name, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Answers are per class: browsers may keep them, shared caches may not
+    patch_cache_control(response, private=True, max_age=MAX_AGE)
+    if immutable:
+        patch_cache_control(response, immutable=True)
+    return response
+
+
+def _file_response(request, storage, name, etag):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(ACCEL_PREFIX.rstrip('/') + '/' + name)
+        return response
+    if SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = storage.path(name)
+        return response
+
+    size = storage.size(name)
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    # A Range with a stale If-Range validator asks for the whole (new) file
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(storage.open(name, 'rb'), start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_alter_studentanswer_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='full_name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
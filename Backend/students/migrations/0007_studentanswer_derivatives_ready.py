@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_student_full_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentanswer',
+            name='derivatives_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:03
+
+import students.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_studentanswer_derivatives_ready'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='studentanswer',
+            name='uploaded_file',
+            field=models.FileField(blank=True, null=True, storage=students.storage.answer_upload_storage, upload_to='student_uploads/'),
+        ),
+    ]
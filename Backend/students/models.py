@@ -4,13 +4,14 @@ from classes.models import Class
 from quizzes.models import Quiz
 from django.core.exceptions import ValidationError
 from quizzes.helpers import QuizGradingHelper
+from .storage import answer_upload_storage
 
 
 class Student(models.Model):
     """
     Represents a student who joins a class using a valid class code.
     """
-    full_name = models.CharField(max_length=255)
+    full_name = models.CharField(max_length=255, db_index=True)
     email = models.EmailField(blank=True, null=True)
     joined_at = models.DateTimeField(auto_now_add=True)
 
@@ -68,7 +69,11 @@ class StudentAnswer(models.Model):
     )
     
     # For file uploads (images, drawings) - stored separately for easier handling
-    uploaded_file = models.FileField(upload_to='student_uploads/', blank=True, null=True)
+    uploaded_file = models.FileField(
+        upload_to='student_uploads/', storage=answer_upload_storage, blank=True, null=True
+    )
+    # Set once the thumbnail and preview of uploaded_file exist (students.derivatives)
+    derivatives_ready = models.BooleanField(default=False, editable=False)
 
     # Auto metadata
     submitted_at = models.DateTimeField(auto_now_add=True)
@@ -138,3 +143,17 @@ class StudentAnswer(models.Model):
 
     def __str__(self):
         return f"Answer by {self.submission.student.full_name} for {self.submission.quiz.title}"
+
+
+class StoredFile(models.Model):
+    """
+    Reference count of one content-addressed file (students.storage).
+    The file is deleted when its last reference is released.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} reference(s))"
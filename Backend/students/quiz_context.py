@@ -0,0 +1,39 @@
+"""
+Request-scoped quiz context for the answer-creation path.
+
+Creating an answer needs the quiz in several places: choosing the type
+serializer, validating the answer, and creating the submission. The
+context loads it once (with its course) and every step shares it.
+"""
+from quizzes.models import Quiz
+
+
+class QuizContext:
+    """Lazily loads the quiz referenced by a request exactly once."""
+
+    _NOT_LOADED = object()
+
+    def __init__(self, quiz_id):
+        self.quiz_id = quiz_id
+        self._quiz = self._NOT_LOADED
+
+    @property
+    def quiz(self):
+        """The quiz, or None when the id is missing, malformed or unknown."""
+        if self._quiz is self._NOT_LOADED:
+            self._quiz = None
+            if self.quiz_id:
+                try:
+                    self._quiz = Quiz.objects.select_related('course').get(id=self.quiz_id)
+                except (Quiz.DoesNotExist, ValueError, TypeError):
+                    pass
+        return self._quiz
+
+    @classmethod
+    def for_request(cls, request):
+        """Return the context attached to this request, creating it on first use."""
+        context = getattr(request, '_quiz_context', None)
+        if context is None:
+            context = cls(request.data.get('quiz_id'))
+            request._quiz_context = context
+        return context
@@ -1,7 +1,85 @@
+import base64
+import binascii
+from django.conf import settings
 from rest_framework import serializers
 from .models import Student, StudentClassEnrollment, StudentQuizSubmission, StudentAnswer
 from classes.models import Class
 from quizzes.models import Quiz
+from quizzes.rules import get_quiz_rules
+from .uploads import format_allowed, uploaded_file_format
+from .media import answer_file_url
+from .derivatives import has_strokes
+from .strokes import StrokeFormatError, decode_strokes
+
+
+_strokes_config = getattr(settings, 'DRAWING_STROKES', {})
+
+
+def validate_uploaded_file(uploaded_file, rules):
+    """
+    Check an upload against the quiz's size and format limits and return its
+    sniffed format. The upload handler usually enforced them while streaming;
+    this covers uploads whose quiz was only known after parsing.
+    """
+    if uploaded_file.size > rules.max_file_size_bytes:
+        raise serializers.ValidationError(
+            f"File size exceeds maximum allowed size of {rules.max_file_size_mb}MB"
+        )
+
+    # Judge the format by the file's content, not its name
+    file_format = uploaded_file_format(uploaded_file)
+    if not format_allowed(file_format, rules.allowed_extensions):
+        raise serializers.ValidationError(
+            f"File format not allowed. Allowed formats: {', '.join(rules.allowed_formats)}"
+        )
+    return file_format
+
+
+class StrokesField(serializers.Field):
+    """Binary stroke payload (students.strokes), sent base64-encoded."""
+    default_error_messages = {
+        'invalid': 'Strokes must be a base64-encoded stroke payload.',
+        'max_bytes': 'Stroke data cannot exceed {max_bytes} bytes.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        max_bytes = _strokes_config.get('MAX_BYTES', 512 * 1024)
+        # Base64 is 4 characters per 3 bytes
+        if len(data) > (max_bytes + 2) // 3 * 4:
+            self.fail('max_bytes', max_bytes=max_bytes)
+        try:
+            return base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            self.fail('invalid')
+
+    def to_representation(self, value):
+        return base64.b64encode(value).decode('ascii')
+
+
+def validate_strokes(payload, rules):
+    """
+    Decode a stroke payload against the quiz's canvas and return the
+    answer_data that stores it.
+    """
+    try:
+        drawing = decode_strokes(
+            payload, rules.canvas_width, rules.canvas_height,
+            max_strokes=_strokes_config.get('MAX_STROKES'),
+            max_points=_strokes_config.get('MAX_POINTS'),
+            max_width=_strokes_config.get('MAX_WIDTH'),
+            max_ink=_strokes_config.get('MAX_INK'),
+        )
+    except StrokeFormatError as exc:
+        raise serializers.ValidationError(str(exc))
+    return {
+        'strokes': base64.b64encode(payload).decode('ascii'),
+        'canvas_width': rules.canvas_width,
+        'canvas_height': rules.canvas_height,
+        'stroke_count': len(drawing.strokes),
+        'point_count': drawing.point_count,
+    }
 
 
 def validate_no_duplicate_answer(quiz, request, serializer_instance):
@@ -69,6 +147,9 @@ class BaseStudentAnswerSerializer(serializers.ModelSerializer):
     quiz_title = serializers.CharField(source='submission.quiz.title', read_only=True)
     quiz_type = serializers.CharField(source='submission.quiz.quiz_type', read_only=True)
     student_name = serializers.CharField(source='submission.student.full_name', read_only=True)
+    # Small renditions of uploaded_file for galleries; null until rendered
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
 
     class Meta:
         model = StudentAnswer
@@ -81,10 +162,43 @@ class BaseStudentAnswerSerializer(serializers.ModelSerializer):
             'student_name',
             'answer_data',
             'uploaded_file',
+            'thumbnail_url',
+            'preview_url',
             'submitted_at',
         ]
         read_only_fields = ['submitted_at']
 
+    def get_thumbnail_url(self, obj):
+        return self.derivative_url(obj, 'thumb')
+
+    def get_preview_url(self, obj):
+        return self.derivative_url(obj, 'preview')
+
+    def derivative_url(self, obj, variant):
+        """Signed URL of a rendered variant, or None until it exists."""
+        # Stroke drawings are rasterized on request, so their variants always exist
+        if not has_strokes(obj) and (not obj.derivatives_ready or not obj.uploaded_file):
+            return None
+        return answer_file_url(self.context.get('request'), obj, variant)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Files are served through the access-checked endpoint, not MEDIA_URL;
+        # for stroke drawings that is their PNG rendering
+        if instance.uploaded_file or has_strokes(instance):
+            data['uploaded_file'] = answer_file_url(self.context.get('request'), instance)
+        return data
+
+    def get_quiz(self, quiz_id):
+        """Return the quiz being answered, reusing one preloaded into the context."""
+        quiz = self.context.get('quiz')
+        if quiz is not None and str(quiz.id) == str(quiz_id):
+            return quiz
+        try:
+            return Quiz.objects.get(id=quiz_id)
+        except Quiz.DoesNotExist:
+            raise serializers.ValidationError("Invalid quiz ID")
+
 
 # Specific serializers for each quiz type
 class ShortAnswerSerializer(BaseStudentAnswerSerializer):
@@ -98,10 +212,7 @@ class ShortAnswerSerializer(BaseStudentAnswerSerializer):
         if not quiz_id:
             return data
         
-        try:
-            quiz = Quiz.objects.get(id=quiz_id)
-        except Quiz.DoesNotExist:
-            raise serializers.ValidationError("Invalid quiz ID")
+        quiz = self.get_quiz(quiz_id)
         
         if quiz.quiz_type != 'short_answer':
             raise serializers.ValidationError("This serializer is for short answer questions only")
@@ -136,13 +247,11 @@ class WordCloudAnswerSerializer(BaseStudentAnswerSerializer):
         if not quiz_id:
             return data
         
-        try:
-            quiz = Quiz.objects.get(id=quiz_id)
-        except Quiz.DoesNotExist:
-            raise serializers.ValidationError("Invalid quiz ID")
+        quiz = self.get_quiz(quiz_id)
         
         if quiz.quiz_type != 'word_cloud':
             raise serializers.ValidationError("This serializer is for word cloud questions only")
+        rules = get_quiz_rules(quiz)
         
         # Check if student has already answered this quiz
         request = self.context.get('request')
@@ -156,28 +265,28 @@ class WordCloudAnswerSerializer(BaseStudentAnswerSerializer):
         words = [word.strip() for word in answer_text.split(',') if word.strip()]
         
         # Check maximum words per student
-        max_words = (quiz.properties or {}).get('max_words_per_student', 1)
+        max_words = rules.max_words
         if len(words) > max_words:
             raise serializers.ValidationError(f"You can submit at most {max_words} word(s). You submitted {len(words)} words.")
         
         # Check minimum words if specified
-        min_words = (quiz.properties or {}).get('min_words_per_student', 1)
+        min_words = rules.min_words
         if len(words) < min_words:
             raise serializers.ValidationError(f"You must submit at least {min_words} word(s). You submitted {len(words)} words.")
         
         # Check for duplicate words if not allowed
-        allow_duplicates = (quiz.properties or {}).get('allow_duplicates', False)
+        allow_duplicates = rules.allow_duplicates
         if not allow_duplicates and len(words) != len(set(words)):
             raise serializers.ValidationError("Duplicate words are not allowed. Please remove duplicates.")
         
         # Check word length limits
-        max_word_length = (quiz.properties or {}).get('max_word_length', 50)
+        max_word_length = rules.max_word_length
         for word in words:
             if len(word) > max_word_length:
                 raise serializers.ValidationError(f"Word '{word}' is too long. Maximum length is {max_word_length} characters.")
         
         # Check minimum word length
-        min_word_length = (quiz.properties or {}).get('min_word_length', 1)
+        min_word_length = rules.min_word_length
         for word in words:
             if len(word) < min_word_length:
                 raise serializers.ValidationError(f"Word '{word}' is too short. Minimum length is {min_word_length} characters.")
@@ -211,13 +320,11 @@ class MultipleChoiceAnswerSerializer(BaseStudentAnswerSerializer):
         if not quiz_id:
             return data
         
-        try:
-            quiz = Quiz.objects.get(id=quiz_id)
-        except Quiz.DoesNotExist:
-            raise serializers.ValidationError("Invalid quiz ID")
+        quiz = self.get_quiz(quiz_id)
         
         if quiz.quiz_type != 'multiple_choice':
             raise serializers.ValidationError("This serializer is for multiple choice questions only")
+        rules = get_quiz_rules(quiz)
         
         # Check if student has already answered this quiz
         request = self.context.get('request')
@@ -228,22 +335,21 @@ class MultipleChoiceAnswerSerializer(BaseStudentAnswerSerializer):
             raise serializers.ValidationError("Selected choice indices are required")
         
         # Validate choice indices
-        choices = (quiz.properties or {}).get('choices', [])
-        if not choices:
+        if not rules.choice_count:
             raise serializers.ValidationError("Quiz has no choices defined")
         
-        max_index = len(choices) - 1
+        max_index = rules.max_choice_index
         for index in selected_indices:
             if not isinstance(index, int) or index < 0 or index > max_index:
                 raise serializers.ValidationError(f"Invalid choice index: {index}. Valid range: 0-{max_index}")
         
         # Validate choice limit
-        max_choices = (quiz.properties or {}).get('max_choices', 1)
+        max_choices = rules.max_choices
         if len(selected_indices) > max_choices:
             raise serializers.ValidationError(f"You can select at most {max_choices} choice(s). You selected {len(selected_indices)}.")
         
         # Validate minimum choices if specified
-        min_choices = (quiz.properties or {}).get('min_choices', 1)
+        min_choices = rules.min_choices
         if len(selected_indices) < min_choices:
             raise serializers.ValidationError(f"You must select at least {min_choices} choice(s). You selected {len(selected_indices)}.")
         
@@ -263,21 +369,19 @@ class MultipleChoiceAnswerSerializer(BaseStudentAnswerSerializer):
 
 
 class DrawingAnswerSerializer(BaseStudentAnswerSerializer):
-    # For drawing, we'll use uploaded_file for the image
-    # Additional drawing metadata can go in answer_data
-    
+    # A drawing is sent either as vector strokes (students.strokes, a fraction
+    # of the size) or as an uploaded image in uploaded_file
+    strokes = StrokesField(write_only=True, required=False)
+
     class Meta(BaseStudentAnswerSerializer.Meta):
-        pass
+        fields = BaseStudentAnswerSerializer.Meta.fields + ['strokes']
     
     def validate(self, data):
         quiz_id = data.get('quiz_id')
         if not quiz_id:
             return data
         
-        try:
-            quiz = Quiz.objects.get(id=quiz_id)
-        except Quiz.DoesNotExist:
-            raise serializers.ValidationError("Invalid quiz ID")
+        quiz = self.get_quiz(quiz_id)
         
         if quiz.quiz_type != 'drawing':
             raise serializers.ValidationError("This serializer is for drawing questions only")
@@ -286,23 +390,17 @@ class DrawingAnswerSerializer(BaseStudentAnswerSerializer):
         request = self.context.get('request')
         validate_no_duplicate_answer(quiz, request, self)
         
-        if not data.get('uploaded_file'):
-            raise serializers.ValidationError("Uploaded file is required for drawing questions")
-        
-        # Store any additional metadata in answer_data
-        data['answer_data'] = data.get('answer_data', {})
-        # Add NOT_IMPLEMENTED placeholders for drawing-specific features
-        data['answer_data'].update({
-            'drawing_strokes': 'NOT_IMPLEMENTED',
-            'drawing_colors': 'NOT_IMPLEMENTED',
-            'drawing_shapes': 'NOT_IMPLEMENTED',
-            'drawing_metadata': 'NOT_IMPLEMENTED',
-            'drawing_analysis': 'NOT_IMPLEMENTED',
-            'drawing_comparison': 'NOT_IMPLEMENTED',
-            'file_analysis': 'NOT_IMPLEMENTED',
-            'content_extraction': 'NOT_IMPLEMENTED',
-            'automatic_grading': 'NOT_IMPLEMENTED'
-        })
+        rules = get_quiz_rules(quiz)
+        strokes = data.pop('strokes', None)
+        if strokes is not None:
+            if data.get('uploaded_file'):
+                raise serializers.ValidationError("Submit either strokes or uploaded_file for drawing questions, not both")
+            data['answer_data'] = validate_strokes(strokes, rules)
+        elif data.get('uploaded_file'):
+            validate_uploaded_file(data['uploaded_file'], rules)
+            data['answer_data'] = data.get('answer_data', {})
+        else:
+            raise serializers.ValidationError("Strokes or an uploaded file are required for drawing questions")
         return data
     
     def create(self, validated_data):
@@ -322,13 +420,11 @@ class ImageUploadAnswerSerializer(BaseStudentAnswerSerializer):
         if not quiz_id:
             return data
         
-        try:
-            quiz = Quiz.objects.get(id=quiz_id)
-        except Quiz.DoesNotExist:
-            raise serializers.ValidationError("Invalid quiz ID")
+        quiz = self.get_quiz(quiz_id)
         
         if quiz.quiz_type != 'image_upload':
             raise serializers.ValidationError("This serializer is for image upload questions only")
+        rules = get_quiz_rules(quiz)
         
         # Check if student has already answered this quiz
         request = self.context.get('request')
@@ -338,34 +434,13 @@ class ImageUploadAnswerSerializer(BaseStudentAnswerSerializer):
         if not uploaded_file:
             raise serializers.ValidationError("Uploaded file is required for image upload questions")
         
-        # Basic file validation
-        props = quiz.properties or {}
-        max_file_size_mb = props.get('max_file_size_mb', 5)
-        allowed_formats = props.get('allowed_formats', 'jpg,png,jpeg').split(',')
-        
-        # Convert MB to bytes
-        max_file_size_bytes = max_file_size_mb * 1024 * 1024
-        
-        # Check file size
-        if uploaded_file.size > max_file_size_bytes:
-            raise serializers.ValidationError(
-                f"File size exceeds maximum allowed size of {max_file_size_mb}MB"
-            )
-        
-        # Check file format
-        file_extension = uploaded_file.name.split('.')[-1].lower() if '.' in uploaded_file.name else ''
-        allowed_extensions = [fmt.strip().lower().lstrip('.') for fmt in allowed_formats]
-        
-        if file_extension not in allowed_extensions:
-            raise serializers.ValidationError(
-                f"File format not allowed. Allowed formats: {', '.join(allowed_formats)}"
-            )
+        file_format = validate_uploaded_file(uploaded_file, rules)
         
         # Store file metadata in answer_data
         data['answer_data'] = {
             'file_name': uploaded_file.name,
             'file_size': uploaded_file.size,
-            'file_format': file_extension
+            'file_format': file_format
         }
         
         return data
@@ -385,12 +460,10 @@ class StudentAnswerSerializer(BaseStudentAnswerSerializer):
         if not quiz_id:
             return data
         
-        try:
-            quiz = Quiz.objects.get(id=quiz_id)
-        except Quiz.DoesNotExist:
-            raise serializers.ValidationError("Invalid quiz ID")
+        quiz = self.get_quiz(quiz_id)
         
         quiz_type = quiz.quiz_type
+        rules = get_quiz_rules(quiz)
         
         # Check if student has already answered this quiz
         request = self.context.get('request')
@@ -403,22 +476,21 @@ class StudentAnswerSerializer(BaseStudentAnswerSerializer):
                 raise serializers.ValidationError("Multiple choice questions require selected_choice_indices in answer_data")
             
             # Validate choice indices
-            choices = (quiz.properties or {}).get('choices', [])
-            if not choices:
+            if not rules.choice_count:
                 raise serializers.ValidationError("Quiz has no choices defined")
             
-            max_index = len(choices) - 1
+            max_index = rules.max_choice_index
             for index in selected_indices:
                 if not isinstance(index, int) or index < 0 or index > max_index:
                     raise serializers.ValidationError(f"Invalid choice index: {index}. Valid range: 0-{max_index}")
             
             # Validate choice limit
-            max_choices = (quiz.properties or {}).get('max_choices', 1)
+            max_choices = rules.max_choices
             if len(selected_indices) > max_choices:
                 raise serializers.ValidationError(f"You can select at most {max_choices} choice(s). You selected {len(selected_indices)}.")
             
             # Validate minimum choices if specified
-            min_choices = (quiz.properties or {}).get('min_choices', 1)
+            min_choices = rules.min_choices
             if len(selected_indices) < min_choices:
                 raise serializers.ValidationError(f"You must select at least {min_choices} choice(s). You selected {len(selected_indices)}.")
             
@@ -440,28 +512,28 @@ class StudentAnswerSerializer(BaseStudentAnswerSerializer):
             words = [word.strip() for word in answer_text.split(',') if word.strip()]
             
             # Check maximum words per student
-            max_words = (quiz.properties or {}).get('max_words_per_student', 1)
+            max_words = rules.max_words
             if len(words) > max_words:
                 raise serializers.ValidationError(f"You can submit at most {max_words} word(s). You submitted {len(words)} words.")
             
             # Check minimum words if specified
-            min_words = (quiz.properties or {}).get('min_words_per_student', 1)
+            min_words = rules.min_words
             if len(words) < min_words:
                 raise serializers.ValidationError(f"You must submit at least {min_words} word(s). You submitted {len(words)} words.")
             
             # Check for duplicate words if not allowed
-            allow_duplicates = (quiz.properties or {}).get('allow_duplicates', False)
+            allow_duplicates = rules.allow_duplicates
             if not allow_duplicates and len(words) != len(set(words)):
                 raise serializers.ValidationError("Duplicate words are not allowed. Please remove duplicates.")
             
             # Check word length limits
-            max_word_length = (quiz.properties or {}).get('max_word_length', 50)
+            max_word_length = rules.max_word_length
             for word in words:
                 if len(word) > max_word_length:
                     raise serializers.ValidationError(f"Word '{word}' is too long. Maximum length is {max_word_length} characters.")
             
             # Check minimum word length
-            min_word_length = (quiz.properties or {}).get('min_word_length', 1)
+            min_word_length = rules.min_word_length
             for word in words:
                 if len(word) < min_word_length:
                     raise serializers.ValidationError(f"Word '{word}' is too short. Minimum length is {min_word_length} characters.")
@@ -470,32 +542,26 @@ class StudentAnswerSerializer(BaseStudentAnswerSerializer):
             if not data.get('uploaded_file'):
                 raise serializers.ValidationError("Image upload questions require uploaded_file")
             
-            # Basic file validation for image upload
-            uploaded_file = data.get('uploaded_file')
-            props = quiz.properties or {}
-            max_file_size_mb = props.get('max_file_size_mb', 5)
-            allowed_formats = props.get('allowed_formats', 'jpg,png,jpeg').split(',')
-            
-            # Convert MB to bytes
-            max_file_size_bytes = max_file_size_mb * 1024 * 1024
-            
-            # Check file size
-            if uploaded_file.size > max_file_size_bytes:
-                raise serializers.ValidationError(
-                    f"File size exceeds maximum allowed size of {max_file_size_mb}MB"
-                )
-            
-            # Check file format
-            file_extension = uploaded_file.name.split('.')[-1].lower() if '.' in uploaded_file.name else ''
-            allowed_extensions = [fmt.strip().lower().lstrip('.') for fmt in allowed_formats]
-            
-            if file_extension not in allowed_extensions:
-                raise serializers.ValidationError(
-                    f"File format not allowed. Allowed formats: {', '.join(allowed_formats)}"
-                )
+            validate_uploaded_file(data['uploaded_file'], rules)
         
         elif quiz_type == 'drawing':
-            if not data.get('uploaded_file'):
-                raise serializers.ValidationError("Drawing questions require uploaded_file")
+            strokes = data.get('answer_data', {}).get('strokes')
+            if strokes is not None:
+                payload = StrokesField().run_validation(strokes)
+                data['answer_data'] = validate_strokes(payload, rules)
+            elif not data.get('uploaded_file'):
+                raise serializers.ValidationError("Drawing questions require strokes or uploaded_file")
+            else:
+                validate_uploaded_file(data['uploaded_file'], rules)
         
         return data
+
+
+# Type-specific answer serializer for each quiz type
+ANSWER_SERIALIZERS = {
+    'short_answer': ShortAnswerSerializer,
+    'word_cloud': WordCloudAnswerSerializer,
+    'multiple_choice': MultipleChoiceAnswerSerializer,
+    'drawing': DrawingAnswerSerializer,
+    'image_upload': ImageUploadAnswerSerializer,
+}
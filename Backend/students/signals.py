@@ -0,0 +1,33 @@
+"""
+Release uploaded files when answers are deleted.
+
+Answer uploads live in content-addressed storage (students.storage), where
+one file may back many answers. Deleting an answer, including through a
+queryset or cascading delete, releases its reference; the last reference
+also removes the file's thumbnail and preview once the transaction commits.
+Stroke drawings drop their cached PNG renderings.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .derivatives import delete_derivatives, delete_stroke_rasters, has_strokes
+from .models import StoredFile, StudentAnswer
+
+
+@receiver(post_delete, sender=StudentAnswer)
+def release_uploaded_file(sender, instance, **kwargs):
+    uploaded_file = instance.uploaded_file
+    if not uploaded_file:
+        if has_strokes(instance):
+            answer_data = instance.answer_data
+            transaction.on_commit(lambda: delete_stroke_rasters(answer_data))
+        return
+    name = uploaded_file.name
+    if uploaded_file.storage.delete(name):
+        transaction.on_commit(lambda: _delete_unreferenced_derivatives(name))
+
+
+def _delete_unreferenced_derivatives(name):
+    # An answer saved since may have referenced the same file again
+    if not StoredFile.objects.filter(name=name, references__gt=0).exists():
+        delete_derivatives(name)
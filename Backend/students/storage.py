@@ -0,0 +1,195 @@
+"""
+Content-addressed, sharded storage for student uploads.
+
+Files are named by the SHA-256 of their bytes and spread over nested shard
+directories, so no directory grows past a few hundred entries:
+
+    student_uploads/photo.jpg -> student_uploads/3f/a9/3fa9...c2.jpg
+
+Identical uploads (a blank canvas, a photo reused by a group) are stored
+once. Every save of a name adds a reference to its StoredFile row and every
+delete() releases one; the bytes are removed once the last reference is
+gone and the transaction that released it has committed. Writing missing
+bytes, adding a reference and removing unreferenced bytes all hold the
+row's lock, so a save never counts on bytes a removal is about to unlink.
+
+Uploads streamed by students.uploads arrive already hashed and on the same
+filesystem, so storing them is a rename. The storage is used by
+StudentAnswer.uploaded_file through STORAGES['answer_uploads'].
+"""
+import hashlib
+import os
+import uuid
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+# Canonical extensions, so the same bytes uploaded as .jpeg and .jpg share a file
+EXTENSION_ALIASES = {'.jpeg': '.jpg', '.tif': '.tiff', '.heif': '.heic'}
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(content):
+    """SHA-256 hex digest of a file, reusing the one computed while it was uploaded."""
+    digest = getattr(content, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return hasher.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that stores each distinct content once, under a name
+    derived from its hash, with reference counts in StoredFile.
+    """
+
+    def __init__(self, shard_depth=2, shard_width=2, **kwargs):
+        super().__init__(**kwargs)
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+
+    def hashed_name(self, name, digest):
+        """Sharded name for content with this digest, keeping name's directory and extension."""
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        extension = EXTENSION_ALIASES.get(extension, extension)
+        shards = [digest[i * self.shard_width:(i + 1) * self.shard_width] for i in range(self.shard_depth)]
+        return '/'.join(filter(None, [directory, *shards, digest + extension]))
+
+    def get_available_name(self, name, max_length=None):
+        # Names are content hashes: an existing file with the same name holds the same bytes
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content_hash(content))
+        self._add_reference(name, content.size, write=lambda full_path: self._write(full_path, content))
+        return name
+
+    def _write(self, full_path, content):
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        # Concurrent writers of the same content race harmlessly: both
+        # replace the name with identical bytes
+        if hasattr(content, 'temporary_file_path'):
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        else:
+            partial_path = f'{full_path}.{uuid.uuid4().hex}.part'
+            with open(partial_path, 'wb') as destination:
+                for chunk in content.chunks():
+                    destination.write(chunk)
+            os.replace(partial_path, full_path)
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def _add_reference(self, name, size, write=None, count=1):
+        """
+        Add references to name, first writing its bytes with write(full_path)
+        if they are missing. Both happen under the StoredFile row's lock, so a
+        concurrent removal of the last reference either finishes first (and
+        the bytes are written again) or sees the new reference and keeps them.
+        """
+        from .models import StoredFile
+
+        with transaction.atomic():
+            self._lock(name, size)
+            full_path = self.path(name)
+            if write is not None and not os.path.exists(full_path):
+                write(full_path)
+            StoredFile.objects.filter(name=name).update(references=F('references') + count)
+
+    @staticmethod
+    def _lock(name, size):
+        from .models import StoredFile
+
+        while True:
+            StoredFile.objects.get_or_create(name=name, defaults={'size': size or 0})
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            # None: a removal deleted the row while we waited for its lock
+            if stored is not None:
+                return stored
+
+    def adopt(self, name):
+        """
+        Bring a file stored under a plain name into the hashed layout and add
+        a reference to it. The file is hard-linked (or copied) to its hashed
+        name and the old name is left in place; returns the hashed name.
+        """
+        from django.core.files import File
+
+        with self.open(name, 'rb') as source:
+            digest = content_hash(File(source))
+        hashed = self.hashed_name(name, digest)
+        if hashed == name:
+            return name
+
+        def link(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(self.path(name), full_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                with self.open(name, 'rb') as source:
+                    self._write(full_path, File(source))
+
+        self._add_reference(hashed, self.size(name), write=link)
+        return hashed
+
+    def delete(self, name):
+        """
+        Release one reference to name. The bytes are removed after the current
+        transaction commits, if no reference was added back in the meantime.
+        Returns True when this released the last reference.
+        """
+        from .models import StoredFile
+
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is None:
+                # Not tracked (written before this storage): a plain delete
+                transaction.on_commit(lambda: FileSystemStorage.delete(self, name))
+                return True
+            if stored.references > 1:
+                StoredFile.objects.filter(name=name).update(references=F('references') - 1)
+                return False
+            # The row stays (unreferenced) so the removal can lock it against new saves
+            StoredFile.objects.filter(name=name).update(references=0)
+        transaction.on_commit(lambda: self._remove_if_unreferenced(name))
+        return True
+
+    def _remove_if_unreferenced(self, name):
+        from .models import StoredFile
+
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is None or stored.references:
+                return
+            super().delete(name)
+            stored.delete()
+
+
+def answer_upload_storage():
+    """Storage of StudentAnswer.uploaded_file (STORAGES['answer_uploads'])."""
+    return storages['answer_uploads']
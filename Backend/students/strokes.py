@@ -0,0 +1,235 @@
+"""
+Compact binary encoding of drawing answers as vector strokes.
+
+A drawing sent as strokes is typically a few KB where the same canvas as a
+PNG is tens to hundreds of KB. Layout (all integers are unsigned LEB128
+varints unless noted; signed values are zigzag-encoded first):
+
+    magic       b'CPS1'
+    colors      count, then count x 4 bytes RGBA
+    widths      count, then count x width in tenths of a pixel
+    strokes     count, then per stroke:
+                    color index, width index, point count (>= 1),
+                    x0, y0 (signed), then dx, dy (signed) per further point
+
+Coordinates are whole canvas pixels; deltas between successive points are
+small, so most take one byte. Decoded points are kept in flat array('i')
+buffers (x0, y0, x1, y1, ...), never as per-point Python objects.
+
+Like students.imaging, this module imports nothing from Django.
+"""
+import io
+from array import array
+from PIL import Image, ImageDraw
+
+
+MAGIC = b'CPS1'
+# Strokes are drawn at this multiple of the output size and downsampled,
+# which antialiases the (aliased) lines Pillow draws
+SUPERSAMPLE = 2
+BACKGROUND = (255, 255, 255)
+
+
+class StrokeFormatError(ValueError):
+    """A stroke payload is malformed or exceeds the canvas or limits."""
+
+
+class Stroke:
+    """One pen stroke: indexes into the drawing's tables and its flat x/y points."""
+    __slots__ = ('color', 'width', 'points')
+
+    def __init__(self, color, width, points):
+        self.color = color
+        self.width = width
+        self.points = points
+
+    def __len__(self):
+        return len(self.points) // 2
+
+
+class Drawing:
+    """Decoded strokes with their color (RGBA tuples) and width (pixels) tables."""
+
+    def __init__(self, colors, widths, strokes):
+        self.colors = colors
+        self.widths = widths
+        self.strokes = strokes
+
+    @property
+    def point_count(self):
+        return sum(len(stroke) for stroke in self.strokes)
+
+
+class _Reader:
+    def __init__(self, payload):
+        self.data = memoryview(payload)
+        self.pos = 0
+
+    def varint(self):
+        data, pos = self.data, self.pos
+        result = shift = 0
+        while True:
+            if pos >= len(data):
+                raise StrokeFormatError('Stroke data ends mid-value')
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+            if shift > 35:
+                raise StrokeFormatError('Stroke data has an oversized value')
+        self.pos = pos
+        return result
+
+    def signed(self):
+        value = self.varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def take(self, size):
+        if self.pos + size > len(self.data):
+            raise StrokeFormatError('Stroke data ends mid-value')
+        chunk = bytes(self.data[self.pos:self.pos + size])
+        self.pos += size
+        return chunk
+
+
+def decode_strokes(payload, canvas_width, canvas_height, max_strokes=None, max_points=None, max_width=None,
+                   max_ink=None):
+    """
+    Decode and validate a stroke payload. Every point must lie on the
+    canvas; table indexes must exist; pen widths, the stroke and total point
+    counts and the ink must stay within the limits. Raises StrokeFormatError
+    otherwise.
+
+    Ink estimates what rasterizing costs, as the area painted relative to
+    the canvas: each stroke covers about width x its path length, plus a
+    width x width joint at every point. max_ink bounds it in canvas areas.
+    """
+    if payload[:len(MAGIC)] != MAGIC:
+        raise StrokeFormatError('Not a stroke payload (bad header)')
+    reader = _Reader(payload)
+    reader.pos = len(MAGIC)
+
+    color_count = reader.varint()
+    colors = [tuple(reader.take(4)) for _ in range(color_count)]
+    width_count = reader.varint()
+    widths = []
+    for _ in range(width_count):
+        tenths = reader.varint()
+        if tenths == 0:
+            raise StrokeFormatError('Stroke widths must be positive')
+        if max_width is not None and tenths > max_width * 10:
+            raise StrokeFormatError(f'Stroke widths cannot exceed {max_width}px')
+        widths.append(tenths / 10)
+
+    stroke_count = reader.varint()
+    if max_strokes is not None and stroke_count > max_strokes:
+        raise StrokeFormatError(f'Drawings can have at most {max_strokes} strokes')
+
+    strokes = []
+    total_points = 0
+    ink = 0
+    ink_limit = None if max_ink is None else max_ink * canvas_width * canvas_height
+    for _ in range(stroke_count):
+        color, width, count = reader.varint(), reader.varint(), reader.varint()
+        if color >= color_count or width >= width_count:
+            raise StrokeFormatError('Stroke refers to a color or width that is not in the tables')
+        if count == 0:
+            raise StrokeFormatError('Strokes must have at least one point')
+        total_points += count
+        if max_points is not None and total_points > max_points:
+            raise StrokeFormatError(f'Drawings can have at most {max_points} points')
+
+        points = array('i', bytes(8 * count))
+        x = y = 0
+        path_length = 0
+        for i in range(count):
+            dx, dy = reader.signed(), reader.signed()
+            x += dx
+            y += dy
+            if not (0 <= x <= canvas_width and 0 <= y <= canvas_height):
+                raise StrokeFormatError(
+                    f'Stroke point ({x}, {y}) is outside the {canvas_width}x{canvas_height} canvas'
+                )
+            if i:
+                path_length += abs(dx) + abs(dy)
+            points[2 * i] = x
+            points[2 * i + 1] = y
+        strokes.append(Stroke(color, width, points))
+
+        pen = widths[width]
+        ink += pen * (path_length + count * pen)
+        if ink_limit is not None and ink > ink_limit:
+            raise StrokeFormatError(f'Drawings can cover the canvas at most {max_ink} times over')
+
+    if reader.pos != len(payload):
+        raise StrokeFormatError('Stroke data has trailing bytes')
+    return Drawing(colors, widths, strokes)
+
+
+def _varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _signed(out, value):
+    _varint(out, (value << 1) ^ (value >> 63))
+
+
+def encode_strokes(drawing):
+    """Encode a Drawing (the inverse of decode_strokes)."""
+    out = bytearray(MAGIC)
+    _varint(out, len(drawing.colors))
+    for color in drawing.colors:
+        out += bytes(color)
+    _varint(out, len(drawing.widths))
+    for width in drawing.widths:
+        _varint(out, round(width * 10))
+    _varint(out, len(drawing.strokes))
+    for stroke in drawing.strokes:
+        _varint(out, stroke.color)
+        _varint(out, stroke.width)
+        _varint(out, len(stroke))
+        x = y = 0
+        points = stroke.points
+        for i in range(0, len(points), 2):
+            _signed(out, points[i] - x)
+            _signed(out, points[i + 1] - y)
+            x, y = points[i], points[i + 1]
+    return bytes(out)
+
+
+def rasterize(drawing, canvas_width, canvas_height, scale=1.0):
+    """Render a drawing onto a white canvas, scaled by scale; returns PNG bytes."""
+    width = max(1, round(canvas_width * scale))
+    height = max(1, round(canvas_height * scale))
+    factor = scale * SUPERSAMPLE
+    image = Image.new('RGB', (width * SUPERSAMPLE, height * SUPERSAMPLE), BACKGROUND)
+    # RGBA drawing blends translucent pens (highlighters) over earlier strokes
+    draw = ImageDraw.Draw(image, 'RGBA')
+
+    for stroke in drawing.strokes:
+        color = drawing.colors[stroke.color]
+        line_width = max(1, round(drawing.widths[stroke.width] * factor))
+        radius = line_width / 2
+        points = [(stroke.points[i] * factor, stroke.points[i + 1] * factor)
+                  for i in range(0, len(stroke.points), 2)]
+        if len(points) > 1:
+            draw.line(points, fill=color, width=line_width, joint='curve')
+        # Round caps (and dots for single-point strokes)
+        for x, y in {points[0], points[-1]}:
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+
+    image = image.resize((width, height), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+
+def render_png(payload, canvas_width, canvas_height, scale=1.0, max_width=None, max_ink=None):
+    """Decode a stroke payload and rasterize it (a picklable job for a worker process)."""
+    drawing = decode_strokes(payload, canvas_width, canvas_height, max_width=max_width, max_ink=max_ink)
+    return rasterize(drawing, canvas_width, canvas_height, scale)
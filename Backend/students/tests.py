@@ -0,0 +1,417 @@
+import io
+import os
+import re
+import shutil
+import tempfile
+from array import array
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from classes.models import Class
+from courses.models import Course
+from quizzes.models import Quiz
+from quizzes.rules import get_quiz_rules
+from .grading import QuizGrader
+from .imaging import render_variants
+from .media import parse_range
+from .models import StoredFile, StudentAnswer
+from .storage import ContentAddressedStorage
+from .strokes import Drawing, Stroke, StrokeFormatError, decode_strokes, encode_strokes, render_png
+
+
+def png_bytes():
+    output = io.BytesIO()
+    Image.new('RGB', (40, 30), (255, 255, 255)).save(output, 'PNG')
+    return output.getvalue()
+
+
+def use_temporary_media(test):
+    """Point MEDIA_ROOT and the upload temp directory at a throwaway directory."""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    media_settings = override_settings(MEDIA_ROOT=media_root)
+    media_settings.enable()
+    test.addCleanup(media_settings.disable)
+    temp_dir = mock.patch('students.uploads.TEMP_DIR', os.path.join(media_root, '.incoming'))
+    temp_dir.start()
+    test.addCleanup(temp_dir.stop)
+    return media_root
+
+
+class StudentClientMixin:
+    """A teacher's course and class, and API clients for students who joined it."""
+
+    def create_classroom(self):
+        self.teacher = User.objects.create_user('teacher', password='pw')
+        self.course = Course.objects.create(name='Math', teacher=self.teacher)
+        self.classroom = Class.objects.create(teacher=self.teacher, course=self.course)
+
+    def student_client(self, name):
+        client = APIClient()
+        response = client.post(
+            '/api/students/join/', {'full_name': name, 'class_code': self.classroom.code}, format='json'
+        )
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access_token'])
+        # Warm the token caches, so the budget only covers answering
+        client.get('/api/students/quizzes/')
+        return client
+
+    def quiz(self, quiz_type, properties):
+        return Quiz.objects.create(
+            course=self.course, created_by=self.teacher, title=quiz_type,
+            quiz_type=quiz_type, properties={'question_text': 'Q', **properties}
+        )
+
+
+class AnswerCreateQueryBudgetTests(StudentClientMixin, TestCase):
+    """
+    POST /api/students/answers/ loads the answered quiz once (QuizContext)
+    and shares it between the view and the serializers, so creating an
+    answer costs a fixed, small number of queries per quiz type. Budgets are
+    for a quiz that already has answers (its live aggregate exists).
+    """
+    # Every type: quiz, duplicate check, submission get_or_create (savepoint,
+    # select, savepoint, insert, release), answer insert, release
+    BASE_QUERIES = 9
+    QUERY_BUDGETS = {
+        # Live aggregate: locked read, update
+        'multiple_choice': BASE_QUERIES + 2,
+        'short_answer': BASE_QUERIES,
+        # Live aggregate read and update, word counts read and upsert
+        'word_cloud': BASE_QUERIES + 4,
+        # Stored file reference: savepoint, get_or_create, locked read, update, release
+        'image_upload': BASE_QUERIES + 5,
+        'drawing': BASE_QUERIES + 5,
+    }
+
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        self.create_classroom()
+
+    def assert_create_budget(self, quiz, make_data, format='json'):
+        path = '/api/students/answers/'
+        if format == 'multipart':
+            path += f'?quiz_id={quiz.id}'
+        first, second = self.student_client('first'), self.student_client('second')
+        response = first.post(path, {'quiz_id': quiz.id, **make_data()}, format=format)
+        self.assertEqual(response.status_code, 201, response.data)
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertNumQueries(self.QUERY_BUDGETS[quiz.quiz_type]):
+                response = second.post(path, {'quiz_id': quiz.id, **make_data()}, format=format)
+        self.assertEqual(response.status_code, 201, response.data)
+        quiz_loads = [query for query in queries.captured_queries if 'FROM "quizzes_quiz"' in query['sql']]
+        self.assertEqual(len(quiz_loads), 1)
+
+    def test_multiple_choice(self):
+        quiz = self.quiz('multiple_choice', {
+            'choices': [{'text': 'a', 'is_correct': True}, {'text': 'b'}], 'max_choices': 1
+        })
+        self.assert_create_budget(quiz, lambda: {'selected_choice_indices': [0]})
+
+    def test_short_answer(self):
+        quiz = self.quiz('short_answer', {'correct_answer': 'paris'})
+        self.assert_create_budget(quiz, lambda: {'answer_text': 'Paris'})
+
+    def test_word_cloud(self):
+        quiz = self.quiz('word_cloud', {'max_words_per_student': 3})
+        self.assert_create_budget(quiz, lambda: {'answer_text': 'red, blue'})
+
+    def test_image_upload(self):
+        quiz = self.quiz('image_upload', {'max_file_size_mb': 5, 'allowed_formats': 'png'})
+        self.assert_create_budget(
+            quiz, lambda: {'uploaded_file': SimpleUploadedFile('photo.png', png_bytes())}, format='multipart'
+        )
+
+    def test_drawing(self):
+        quiz = self.quiz('drawing', {'canvas_width': 800, 'canvas_height': 600, 'allowed_formats': 'png'})
+        self.assert_create_budget(
+            quiz, lambda: {'uploaded_file': SimpleUploadedFile('drawing.png', png_bytes())}, format='multipart'
+        )
+
+
+class AnswerUploadStreamingTests(StudentClientMixin, TestCase):
+    """Uploads naming their quiz up front are refused while they stream in (students.uploads)."""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = use_temporary_media(self)
+        self.create_classroom()
+        self.image_quiz = self.quiz('image_upload', {'max_file_size_mb': 1, 'allowed_formats': 'png'})
+        self.client = self.student_client('student')
+
+    def upload(self, name, content):
+        return self.client.post(
+            f'/api/students/answers/?quiz_id={self.image_quiz.id}',
+            {'quiz_id': self.image_quiz.id, 'uploaded_file': SimpleUploadedFile(name, content)},
+            format='multipart'
+        )
+
+    def test_oversize_upload_is_refused_with_413(self):
+        response = self.upload('photo.png', png_bytes() + bytes(2 * 1024 * 1024))
+        self.assertEqual(response.status_code, 413, response.data)
+        self.assertFalse(StudentAnswer.objects.exists())
+
+    def test_disallowed_magic_number_is_refused_with_415(self):
+        # Named .png, but the bytes are a GIF
+        response = self.upload('photo.png', b'GIF89a' + bytes(64))
+        self.assertEqual(response.status_code, 415, response.data)
+        self.assertFalse(StudentAnswer.objects.exists())
+
+    def test_refused_uploads_leave_no_temporary_files(self):
+        self.upload('photo.png', png_bytes() + bytes(2 * 1024 * 1024))
+        self.upload('photo.png', b'GIF89a' + bytes(64))
+        incoming = os.path.join(self.media_root, '.incoming')
+        self.assertEqual(os.listdir(incoming) if os.path.isdir(incoming) else [], [])
+
+
+class RenderVariantsTests(SimpleTestCase):
+    """Thumbnails and previews (students.imaging) fit their bounding box and never upscale."""
+
+    def image_bytes(self, size, image_format='PNG'):
+        output = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(output, image_format)
+        return output.getvalue()
+
+    def test_variants_fit_their_longest_side(self):
+        rendered = render_variants(self.image_bytes((1000, 500)), {'thumb': 320, 'preview': 1280})
+        sizes = {name: Image.open(io.BytesIO(data)).size for name, data in rendered.items()}
+        self.assertEqual(sizes, {'thumb': (320, 160), 'preview': (1000, 500)})
+
+    def test_variants_are_encoded_in_the_requested_format(self):
+        rendered = render_variants(self.image_bytes((600, 800), 'JPEG'), {'thumb': 320}, image_format='WEBP')
+        with Image.open(io.BytesIO(rendered['thumb'])) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (240, 320)))
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Identical uploads share one reference-counted file (students.storage)."""
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage(location=use_temporary_media(self))
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save('student_uploads/a.png', ContentFile(png_bytes()))
+        second = self.storage.save('student_uploads/b.jpeg', ContentFile(b'other'))
+        third = self.storage.save('student_uploads/c.png', ContentFile(png_bytes()))
+        self.assertEqual(first, third)
+        self.assertNotEqual(first, second)
+        self.assertRegex(first, r'^student_uploads/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertTrue(second.endswith('.jpg'))
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+
+    def test_delete_releases_one_reference_and_keeps_the_bytes(self):
+        name = self.storage.save('student_uploads/a.png', ContentFile(png_bytes()))
+        self.storage.save('student_uploads/b.png', ContentFile(png_bytes()))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(self.storage.delete(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_last_reference_removes_the_bytes_on_commit(self):
+        name = self.storage.save('student_uploads/a.png', ContentFile(png_bytes()))
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.assertTrue(self.storage.delete(name))
+        self.assertTrue(self.storage.exists(name))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_saving_again_before_the_removal_commits_keeps_the_bytes(self):
+        name = self.storage.save('student_uploads/a.png', ContentFile(png_bytes()))
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.storage.delete(name)
+        self.storage.save('student_uploads/b.png', ContentFile(png_bytes()))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+
+
+class AnswerFileTests(StudentClientMixin, TestCase):
+    """GET /api/students/answers/<id>/file/ (students.media): access and Range requests."""
+
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        self.create_classroom()
+        quiz = self.quiz('image_upload', {'max_file_size_mb': 5, 'allowed_formats': 'png'})
+        self.content = png_bytes()
+        response = self.student_client('student').post(
+            '/api/students/answers/',
+            {'quiz_id': quiz.id, 'uploaded_file': SimpleUploadedFile('photo.png', self.content)},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.signed_url = response.data['uploaded_file']
+        self.path = f"/api/students/answers/{response.data['id']}/file/"
+        self.teacher_client = APIClient()
+        self.teacher_client.force_authenticate(self.teacher)
+
+    def test_unsigned_anonymous_request_is_not_found(self):
+        self.assertEqual(APIClient().get(self.path).status_code, 404)
+
+    def test_signed_url_serves_the_file_without_credentials(self):
+        response = APIClient().get(self.signed_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_tampered_signature_is_not_found(self):
+        tampered = re.sub(r'signature=[^&]+', 'signature=forged', self.signed_url)
+        self.assertEqual(APIClient().get(tampered).status_code, 404)
+
+    def test_range_request_gets_206_with_the_requested_bytes(self):
+        response = self.teacher_client.get(self.path, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[:10])
+
+    def test_unsatisfiable_range_gets_416(self):
+        response = self.teacher_client.get(self.path, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=-5', 10), (5, 9))
+        self.assertEqual(parse_range('bytes=2-', 10), (2, 9))
+        self.assertEqual(parse_range('bytes=2-100', 10), (2, 9))
+        self.assertIsNone(parse_range('bytes=0-1,4-5', 10))
+        self.assertIsNone(parse_range(None, 10))
+        for header, size in [('bytes=-5', 0), ('bytes=0-', 0), ('bytes=10-', 10), ('bytes=5-2', 10)]:
+            with self.subTest(header=header, size=size), self.assertRaises(ValueError):
+                parse_range(header, size)
+
+
+class StrokeCodecTests(SimpleTestCase):
+    """Binary stroke payloads (students.strokes) round-trip and malformed ones are refused."""
+
+    def drawing(self, *strokes, widths=(2.5,)):
+        return Drawing(
+            [(0, 0, 0, 255), (255, 0, 0, 128)], list(widths),
+            [Stroke(color, 0, array('i', points)) for color, points in strokes]
+        )
+
+    def test_round_trip(self):
+        drawing = self.drawing((0, [10, 10, 12, 11, 40, 5]), (1, [799, 599]))
+        decoded = decode_strokes(encode_strokes(drawing), 800, 600)
+        self.assertEqual(decoded.colors, drawing.colors)
+        self.assertEqual(decoded.widths, [2.5])
+        self.assertEqual(
+            [(stroke.color, stroke.width, list(stroke.points)) for stroke in decoded.strokes],
+            [(0, 0, [10, 10, 12, 11, 40, 5]), (1, 0, [799, 599])]
+        )
+        self.assertEqual(decoded.point_count, 4)
+
+    def test_rasterizes_at_canvas_size(self):
+        payload = encode_strokes(self.drawing((0, [10, 10, 90, 50])))
+        with Image.open(io.BytesIO(render_png(payload, 100, 60))) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (100, 60)))
+            self.assertEqual(image.getpixel((0, 59)), (255, 255, 255))
+            self.assertNotEqual(image.getpixel((50, 30)), (255, 255, 255))
+
+    def test_malformed_payloads_are_refused(self):
+        valid = encode_strokes(self.drawing((0, [10, 10, 20, 20])))
+        # magic, 2 colors, 1 width (25 tenths), 1 stroke: color 0, width 0, 1 point at (0, 0)
+        header = b'CPS1' + b'\x02' + bytes(8) + b'\x01\x19' + b'\x01'
+        cases = {
+            'bad header': b'PNG!' + valid[4:],
+            'truncated': valid[:-1],
+            'trailing bytes': valid + b'\x00',
+            'unknown color': header + b'\x05\x00\x01\x00\x00',
+            'no points': header + b'\x00\x00\x00',
+            'zero width': b'CPS1\x00\x01\x00\x00',
+            'off canvas': encode_strokes(self.drawing((0, [10, 10, 801, 10]))),
+        }
+        for case, payload in cases.items():
+            with self.subTest(case), self.assertRaises(StrokeFormatError):
+                decode_strokes(payload, 800, 600)
+
+    def test_limits(self):
+        strokes = [(0, [10, 10, 20, 20])] * 3
+        payload = encode_strokes(self.drawing(*strokes))
+        with self.assertRaises(StrokeFormatError):
+            decode_strokes(payload, 800, 600, max_strokes=2)
+        with self.assertRaises(StrokeFormatError):
+            decode_strokes(payload, 800, 600, max_points=5)
+        with self.assertRaises(StrokeFormatError):
+            decode_strokes(encode_strokes(self.drawing(*strokes, widths=(65,))), 800, 600, max_width=64)
+        # A wide pen dragged back and forth covers the canvas many times over
+        scribble = [0, 0] + [800, 600, 0, 0] * 100
+        with self.assertRaises(StrokeFormatError):
+            decode_strokes(encode_strokes(self.drawing((0, scribble), widths=(64,))), 800, 600, max_ink=20)
+        self.assertEqual(len(decode_strokes(payload, 800, 600, 3, 6, 64, 20).strokes), 3)
+
+    def test_quiz_canvas_size_is_capped(self):
+        quiz = Quiz(quiz_type='drawing', properties={'question_text': 'Q', 'canvas_width': 2000, 'canvas_height': 900})
+        quiz.clean_properties()
+        quiz.properties['canvas_width'] = 20000
+        with self.assertRaises(ValidationError):
+            quiz.clean_properties()
+
+
+class QuizGraderTests(TestCase):
+    """Multiple choice scores agree with the live tally (live.aggregation)."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='pw')
+        self.course = Course.objects.create(name='Math', teacher=self.teacher)
+
+    def grader(self, allow_multiple):
+        quiz = Quiz.objects.create(
+            course=self.course, created_by=self.teacher, title='mc', quiz_type='multiple_choice',
+            properties={
+                'question_text': 'Q',
+                'choices': [{'text': 'a', 'is_correct': True}, {'text': 'b', 'is_correct': True}, {'text': 'c'}],
+                'allow_multiple_choices': allow_multiple,
+                'max_choices': 3 if allow_multiple else 1,
+            }
+        )
+        return QuizGrader(quiz)
+
+    def test_single_choice_with_several_correct_options_scores_a_correct_pick_in_full(self):
+        grader = self.grader(allow_multiple=False)
+        self.assertEqual(grader.score({'selected_choice_indices': [1]}), Decimal('1.00'))
+        self.assertEqual(grader.score({'selected_choice_indices': [2]}), Decimal('0.00'))
+
+    def test_multiple_choice_scores_net_correct_picks_per_correct_option(self):
+        grader = self.grader(allow_multiple=True)
+        self.assertEqual(grader.score({'selected_choice_indices': [0]}), Decimal('0.50'))
+        self.assertEqual(grader.score({'selected_choice_indices': [0, 1]}), Decimal('1.00'))
+        self.assertEqual(grader.score({'selected_choice_indices': [0, 2]}), Decimal('0.00'))
+
+
+class QuizRulesCacheTests(TestCase):
+    """Cached rules (quizzes.rules) always match the quiz's current properties."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='pw')
+        self.course = Course.objects.create(name='Math', teacher=self.teacher)
+        self.quiz = Quiz.objects.create(
+            course=self.course, created_by=self.teacher, title='sa', quiz_type='short_answer',
+            properties={'question_text': 'Q', 'correct_answer': 'paris'}
+        )
+
+    def test_concurrent_edits_write_distinct_versions(self):
+        first, second = Quiz.objects.get(pk=self.quiz.pk), Quiz.objects.get(pk=self.quiz.pk)
+        first.properties = {**first.properties, 'correct_answer': 'rome'}
+        first.save()
+        second.properties = {**second.properties, 'correct_answer': 'oslo'}
+        second.save()
+        self.assertEqual((first.version, second.version), (2, 3))
+        self.assertEqual(Quiz.objects.get(pk=self.quiz.pk).version, 3)
+
+    def test_queryset_update_of_properties_recompiles_rules(self):
+        self.assertEqual(get_quiz_rules(self.quiz).correct_answer, 'paris')
+        Quiz.objects.filter(pk=self.quiz.pk).update(properties={'question_text': 'Q', 'correct_answer': 'rome'})
+        self.assertEqual(get_quiz_rules(Quiz.objects.get(pk=self.quiz.pk)).correct_answer, 'rome')
@@ -0,0 +1,213 @@
+"""
+Streaming, size-enforced ingestion of answer uploads.
+
+Django's default handlers buffer an upload (in memory, or in a temporary
+directory) before the serializer can look at its size or name. For answer
+uploads StudentAnswerViewSet installs AnswerUploadHandler instead, which:
+
+- rejects a request whose Content-Length already exceeds the limit,
+- counts bytes as they stream in and stops reading at the limit (413),
+- sniffs the format from the file's magic bytes in the first chunk and
+  stops reading when it is not allowed (415),
+- writes straight to a temporary file on the media filesystem
+  (UPLOADS['TEMP_DIR']), hashing it on the way, so saving the answer
+  renames it into place (students.storage) instead of copying or
+  re-reading it.
+
+The limits are the quiz's max_file_size_mb and allowed_formats when the
+client names the quiz before the body (?quiz_id= or an X-Quiz-Id header);
+otherwise the global UPLOADS limits apply while streaming and the serializer
+checks the quiz's own limits afterwards.
+"""
+import hashlib
+import os
+import tempfile
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+
+_config = getattr(settings, 'UPLOADS', {})
+MAX_BYTES = _config.get('MAX_BYTES', 20 * 1024 * 1024)
+# Must be on the same filesystem as MEDIA_ROOT for saves to be renames
+TEMP_DIR = str(_config.get('TEMP_DIR', os.path.join(settings.MEDIA_ROOT, '.incoming')))
+# Multipart boundaries and the other form fields on top of the file itself
+FORM_OVERHEAD_BYTES = _config.get('FORM_OVERHEAD_BYTES', 64 * 1024)
+
+# Leading bytes of each supported format; (offset, signature)
+FORMAT_SIGNATURES = (
+    ('jpeg', 0, b'\xff\xd8\xff'),
+    ('png', 0, b'\x89PNG\r\n\x1a\n'),
+    ('gif', 0, b'GIF87a'),
+    ('gif', 0, b'GIF89a'),
+    ('bmp', 0, b'BM'),
+    ('tiff', 0, b'II*\x00'),
+    ('tiff', 0, b'MM\x00*'),
+    ('heic', 4, b'ftypheic'),
+    ('heic', 4, b'ftypheix'),
+    ('heic', 4, b'ftypmif1'),
+)
+SNIFF_BYTES = 16
+
+# File extensions quizzes list in allowed_formats, per sniffed format
+FORMAT_EXTENSIONS = {
+    'jpeg': frozenset({'jpg', 'jpeg'}),
+    'png': frozenset({'png'}),
+    'gif': frozenset({'gif'}),
+    'webp': frozenset({'webp'}),
+    'bmp': frozenset({'bmp'}),
+    'tiff': frozenset({'tif', 'tiff'}),
+    'heic': frozenset({'heic', 'heif'}),
+}
+ALL_EXTENSIONS = frozenset().union(*FORMAT_EXTENSIONS.values())
+
+
+def sniff_format(head):
+    """Image format named by a file's leading bytes, or None."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for name, offset, signature in FORMAT_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return name
+    return None
+
+
+def format_allowed(file_format, allowed_extensions):
+    """True when a sniffed format matches one of a quiz's allowed extensions."""
+    return bool(file_format) and not FORMAT_EXTENSIONS.get(file_format, frozenset()).isdisjoint(allowed_extensions)
+
+
+class StreamedUploadedFile(TemporaryUploadedFile):
+    """
+    A TemporaryUploadedFile created in TEMP_DIR. FileSystemStorage moves
+    files exposing temporary_file_path() into place with a rename.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=TEMP_DIR)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+        self.sniffed_format = None
+        self.content_hash = None
+
+
+class UploadRejected:
+    """Why an upload was refused, with the HTTP status to answer."""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.message = message
+
+
+class AnswerUploadHandler(FileUploadHandler):
+    """
+    Streams an answer upload to disk, enforcing a byte limit and a set of
+    allowed formats while it arrives. Sniffed formats are kept on the
+    uploaded file as .sniffed_format.
+    """
+
+    def __init__(self, request=None, max_bytes=MAX_BYTES, allowed_extensions=ALL_EXTENSIONS,
+                 limit_label=None, formats_label=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.allowed_extensions = frozenset(allowed_extensions)
+        self.limit_label = limit_label or f'{max_bytes // (1024 * 1024)}MB'
+        self.formats_label = formats_label or ', '.join(sorted(self.allowed_extensions))
+        self.rejection = None
+        self.file = None
+        self.received = 0
+        self.head = b''
+        self.sniffed_format = None
+
+    def reject(self, status_code, message):
+        self.rejection = UploadRejected(status_code, message)
+        if self.file is not None:
+            self.file.close()
+        # Stop reading the body: the rest of the upload is never received
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > self.max_bytes + FORM_OVERHEAD_BYTES:
+            self.rejection = UploadRejected(
+                413, f"File size exceeds maximum allowed size of {self.limit_label}"
+            )
+            # Answer without parsing (or reading) the body at all
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.head = b''
+        self.sniffed_format = None
+        self.hasher = hashlib.sha256()
+        self.file = StreamedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.reject(413, f"File size exceeds maximum allowed size of {self.limit_label}")
+
+        if self.sniffed_format is None and len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self.check_format()
+
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def check_format(self):
+        self.sniffed_format = sniff_format(self.head)
+        if not format_allowed(self.sniffed_format, self.allowed_extensions):
+            self.reject(415, f"File format not allowed. Allowed formats: {self.formats_label}")
+
+    def file_complete(self, file_size):
+        if self.sniffed_format is None:
+            # Files shorter than the sniffing window
+            self.check_format()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sniffed_format = self.sniffed_format
+        self.file.content_hash = self.hasher.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def uploaded_file_format(uploaded_file):
+    """Sniffed format of an uploaded file, reading its head if no handler did."""
+    file_format = getattr(uploaded_file, 'sniffed_format', None)
+    if file_format is None:
+        uploaded_file.seek(0)
+        file_format = sniff_format(uploaded_file.read(SNIFF_BYTES))
+        uploaded_file.seek(0)
+    return file_format
+
+
+def install_answer_upload_handler(request, quiz=None):
+    """
+    Replace the request's upload handlers (before its body is read) with an
+    AnswerUploadHandler using the quiz's limits, or the global ones.
+    """
+    if quiz is not None:
+        from quizzes.rules import get_quiz_rules
+
+        rules = get_quiz_rules(quiz)
+        handler = AnswerUploadHandler(
+            request,
+            max_bytes=rules.max_file_size_bytes,
+            allowed_extensions=rules.allowed_extensions & ALL_EXTENSIONS,
+            limit_label=f'{rules.max_file_size_mb}MB',
+            formats_label=', '.join(rules.allowed_formats),
+        )
+    else:
+        handler = AnswerUploadHandler(request)
+    # DRF requests wrap the Django request that owns the upload handlers
+    getattr(request, '_request', request).upload_handlers = [handler]
+    return handler
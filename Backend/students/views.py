@@ -1,16 +1,23 @@
+import zlib
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.views import APIView
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
-from classes.models import Class
+from django.utils.cache import get_conditional_response, patch_cache_control
+from classes.active_classes import get_active_class
 from quizzes.models import Quiz
+from quizzes import content_cache
 from .models import Student, StudentClassEnrollment, StudentQuizSubmission, StudentAnswer
 from .serializers import (
     StudentSerializer, StudentClassEnrollmentSerializer,
     StudentQuizSubmissionSerializer, StudentAnswerSerializer,
     ShortAnswerSerializer, WordCloudAnswerSerializer, 
     MultipleChoiceAnswerSerializer, DrawingAnswerSerializer,
-    ImageUploadAnswerSerializer
+    ImageUploadAnswerSerializer, ANSWER_SERIALIZERS
 )
 # Permissions are imported but not currently used in views
 # from .permissions import (
@@ -19,6 +26,17 @@ from .serializers import (
 #     StudentAnswerAccess
 # )
 from .authentication import StudentToken, StudentAuthentication, StudentUser
+from . import auth_cache, media
+from .grading import schedule_grading
+from .derivatives import (
+    VARIANTS as DERIVATIVE_VARIANTS, derivative_name, has_strokes, schedule_derivatives, stroke_raster
+)
+from .ingestion import ingestion_queue, get_receipt
+from .quiz_context import QuizContext
+from .uploads import install_answer_upload_handler
+from live.aggregation import record_answers
+from live.events import publish_answer_created
+from classpoint_backend.db_router import ReplicaReadsMixin
 
 
 class StudentViewSet(viewsets.ModelViewSet):
@@ -80,13 +98,20 @@ class StudentClassEnrollmentViewSet(viewsets.ModelViewSet):
             return StudentClassEnrollment.objects.filter(student_id=student_id).order_by('-joined_at')
         return StudentClassEnrollment.objects.none()
 
+    def perform_destroy(self, instance):
+        """Delete the enrollment and drop it from the student auth cache."""
+        enrollment_id = instance.id
+        super().perform_destroy(instance)
+        auth_cache.invalidate_enrollment(enrollment_id)
+
 
-class StudentQuizSubmissionViewSet(viewsets.ModelViewSet):
+class StudentQuizSubmissionViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     ViewSet for StudentQuizSubmission model.
     - Teachers can view all submissions in their classes
     - Students can view their own submissions
     - Only enrolled students can create submissions
+    - Lists read from the replica when one is configured
     """
     queryset = StudentQuizSubmission.objects.all()
     serializer_class = StudentQuizSubmissionSerializer
@@ -107,6 +132,10 @@ class StudentQuizSubmissionViewSet(viewsets.ModelViewSet):
             return StudentQuizSubmission.objects.none()
 
 
+# Read by the answer serializers (names, titles, file access checks)
+ANSWER_RELATED = ('submission__student', 'submission__quiz__course')
+
+
 class StudentAnswerViewSet(viewsets.ModelViewSet):
     """
     ViewSet for StudentAnswer model.
@@ -119,28 +148,44 @@ class StudentAnswerViewSet(viewsets.ModelViewSet):
     # Dynamic: allow unauthenticated read when querying by student_id; otherwise require auth
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_quiz_context(self):
+        """Quiz referenced by the request, loaded once and shared by view and serializers."""
+        return QuizContext.for_request(self.request)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action == 'create' and request.content_type.startswith('multipart/'):
+            # Uploads are checked while they stream in; the quiz's own limits apply
+            # when the client names it before the body
+            quiz_id = request.query_params.get('quiz_id') or request.headers.get('X-Quiz-Id')
+            quiz = None
+            if quiz_id:
+                request._quiz_context = QuizContext(quiz_id)
+                quiz = request._quiz_context.quiz
+            self.upload_handler = install_answer_upload_handler(request, quiz)
+
+    def create(self, request, *args, **kwargs):
+        handler = getattr(self, 'upload_handler', None)
+        if handler is not None:
+            data = request.data
+            if handler.rejection is not None:
+                return Response(
+                    {'uploaded_file': [handler.rejection.message]},
+                    status=handler.rejection.status_code
+                )
+            # The body's quiz_id is authoritative; the hint only set upload limits
+            context = getattr(request, '_quiz_context', None)
+            if context is not None and str(context.quiz_id) != str(data.get('quiz_id')):
+                del request._quiz_context
+        return super().create(request, *args, **kwargs)
+
     def get_serializer_class(self):
         """Return appropriate serializer based on quiz type for creation."""
         if self.action == 'create':
-            quiz_id = self.request.data.get('quiz_id')
-            if quiz_id:
-                try:
-                    quiz = Quiz.objects.get(id=quiz_id)
-                    quiz_type = quiz.quiz_type
-                    
-                    # Return specific serializer based on quiz type
-                    if quiz_type == 'short_answer':
-                        return ShortAnswerSerializer
-                    elif quiz_type == 'word_cloud':
-                        return WordCloudAnswerSerializer
-                    elif quiz_type == 'multiple_choice':
-                        return MultipleChoiceAnswerSerializer
-                    elif quiz_type == 'drawing':
-                        return DrawingAnswerSerializer
-                    elif quiz_type == 'image_upload':
-                        return ImageUploadAnswerSerializer
-                except Quiz.DoesNotExist:
-                    pass
+            quiz = self.get_quiz_context().quiz
+            # Return specific serializer based on quiz type
+            if quiz is not None and quiz.quiz_type in ANSWER_SERIALIZERS:
+                return ANSWER_SERIALIZERS[quiz.quiz_type]
         
         # ALAA_SAJA_TODO: Handle multi-quiz submissions
         # Add logic to handle student answers for multi-quiz:
@@ -156,9 +201,18 @@ class StudentAnswerViewSet(viewsets.ModelViewSet):
         # Default serializer for read operations or unknown quiz types
         return StudentAnswerSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'create':
+            context['quiz'] = self.get_quiz_context().quiz
+        return context
+
     def get_permissions(self):
         if self.request.method == 'GET' and self.request.query_params.get('student_id'):
             return [permissions.AllowAny()]
+        if self.action == 'file':
+            # Signed URLs (see students.media) work without credentials
+            return [permissions.AllowAny()]
         return super().get_permissions()
     
     def get_queryset(self):
@@ -167,32 +221,41 @@ class StudentAnswerViewSet(viewsets.ModelViewSet):
             # Student with valid token can see their own answers
             return StudentAnswer.objects.filter(
                 submission__student_id=self.request.user.student.id
-            ).order_by('-submitted_at')
+            ).select_related(*ANSWER_RELATED).order_by('-submitted_at')
         elif self.request.user.is_authenticated:
             # Teacher can see all answers in their classes
             return StudentAnswer.objects.filter(
                 submission__quiz__course__teacher=self.request.user
-            ).order_by('-submitted_at')
+            ).select_related(*ANSWER_RELATED).order_by('-submitted_at')
         # Unauthenticated: allow only direct lookup by student_id
         student_id = self.request.query_params.get('student_id')
         if student_id:
             return StudentAnswer.objects.filter(
                 submission__student_id=student_id
-            ).order_by('-submitted_at')
+            ).select_related(*ANSWER_RELATED).order_by('-submitted_at')
         return StudentAnswer.objects.none()
     
+    @transaction.atomic
     def perform_create(self, serializer):
         """Ensure student can only create answers for their own submissions."""
         if isinstance(self.request.user, StudentUser):
-            quiz_id = self.request.data.get('quiz_id')
-            if quiz_id:
+            quiz = self.get_quiz_context().quiz
+            if quiz is not None:
                 # Get or create the submission for this student and quiz
                 submission, created = StudentQuizSubmission.objects.get_or_create(
                     student=self.request.user.student,
-                    quiz_id=quiz_id,
+                    quiz=quiz,
                     defaults={'score': None, 'is_late': False}
                 )
-                serializer.save(submission=submission)
+                answer = serializer.save(submission=submission)
+
+                # Fold into the live aggregates, queue for grading and push to live result streams
+                record_answers(quiz, [answer])
+                schedule_grading(quiz, [answer])
+                publish_answer_created(
+                    answer, quiz, self.request.user.student,
+                    classroom_id=self.request.user.classroom.id
+                )
             else:
                 # If no quiz_id provided, use the provided submission
                 super().perform_create(serializer)
@@ -200,6 +263,97 @@ class StudentAnswerViewSet(viewsets.ModelViewSet):
             # For teachers or other cases, use the provided submission
             super().perform_create(serializer)
 
+        # Thumbnail and preview of an uploaded image / drawing, rendered in the background
+        schedule_derivatives([serializer.instance])
+
+    @action(detail=True, methods=['get'], url_path='file', url_name='file')
+    def file(self, request, pk=None):
+        """
+        Serve the answer's uploaded file (a PNG of a stroke drawing), or its
+        ?variant=thumb|preview, to the answer's student, the course's teacher
+        or a signed URL holder.
+        """
+        variant = request.query_params.get('variant') or None
+        if variant is not None and variant not in DERIVATIVE_VARIANTS:
+            return Response({"detail": "Unknown variant."}, status=status.HTTP_404_NOT_FOUND)
+
+        if media.signature_valid(pk, variant, request.query_params):
+            answers = StudentAnswer.objects.all()
+        elif request.user.is_authenticated:
+            answers = self.get_queryset()
+        else:
+            answers = StudentAnswer.objects.none()
+        answer = answers.select_related(None).filter(pk=pk).only(
+            'id', 'uploaded_file', 'derivatives_ready', 'answer_data'
+        ).first()
+        if answer is None or not (answer.uploaded_file or has_strokes(answer)):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if not answer.uploaded_file:
+            # Stroke drawing: its PNG renderings are made on first request
+            storage, name = default_storage, stroke_raster(answer, variant)
+        elif variant is None:
+            storage, name = answer.uploaded_file.storage, answer.uploaded_file.name
+        elif answer.derivatives_ready:
+            storage, name = default_storage, derivative_name(answer.uploaded_file.name, variant)
+        else:
+            return Response({"detail": "Not rendered yet."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return media.serve_file(request, storage, name, immutable=variant is None)
+        except FileNotFoundError:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['post'], url_path='submit')
+    def submit(self, request):
+        """
+        Queue an answer for batched ingestion and return 202 with a receipt.
+        Poll the receipt to confirm the answer was persisted; the queue is in
+        memory, so resubmit if it never is (see students.ingestion). File
+        uploads (drawing / image upload) must use the regular create endpoint.
+        """
+        if not isinstance(request.user, StudentUser):
+            return Response(
+                {"error": "Student authentication required"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        if request.FILES:
+            return Response(
+                {"error": "File uploads must be submitted to /api/students/answers/."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            quiz_id = int(request.data.get('quiz_id'))
+        except (TypeError, ValueError):
+            return Response({"error": "quiz_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        receipt_id = ingestion_queue.submit(
+            student=request.user.student,
+            classroom_id=request.user.classroom.id,
+            quiz_id=quiz_id,
+            payload=request.data.copy(),
+        )
+        return Response(
+            {
+                "receipt_id": receipt_id,
+                "status": "queued",
+                "status_url": reverse('answer-receipt', kwargs={'receipt_id': receipt_id}, request=request),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @action(detail=False, methods=['get'], url_path=r'receipts/(?P<receipt_id>[0-9a-f]{32})', url_name='receipt')
+    def receipt(self, request, receipt_id=None):
+        """Report whether a queued answer was persisted or rejected."""
+        receipt = get_receipt(receipt_id)
+        if (
+            receipt is None
+            or not isinstance(request.user, StudentUser)
+            or receipt['student_id'] != request.user.student.id
+        ):
+            return Response({"detail": "Receipt not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(receipt)
+
 
 class JoinClassView(APIView):
     """
@@ -219,46 +373,50 @@ class JoinClassView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Check if class exists and is active
-        classroom = Class.objects.filter(code=class_code, active=True).first()
+        # Resolve the code from the cached active-class map (course included)
+        classroom = get_active_class(class_code)
         if not classroom:
             return Response(
                 {"error": "Invalid or inactive class code."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Create or get the student
-        student, _ = Student.objects.get_or_create(full_name=full_name)
-
-        # Check if already enrolled
-        already_enrolled = StudentClassEnrollment.objects.filter(
-            student=student, classroom=classroom
-        ).exists()
-        if already_enrolled:
-            return Response(
-                {
-                    "message": "You are already enrolled in this class.",
-                    "student_id": student.id,
-                    "class_id": classroom.id,
-                },
-                status=status.HTTP_200_OK,
-            )
+        with transaction.atomic():
+            # Create or get the student (full_name is indexed)
+            student = Student.objects.filter(full_name=full_name).order_by('id').first()
+            created = student is None
+            if created:
+                student = Student.objects.create(full_name=full_name)
+                enrollment = StudentClassEnrollment.objects.create(student=student, classroom=classroom)
+            else:
+                # Let the unique (student, classroom) constraint detect re-joins
+                try:
+                    with transaction.atomic():
+                        enrollment = StudentClassEnrollment.objects.create(student=student, classroom=classroom)
+                    created = True
+                except IntegrityError:
+                    enrollment = StudentClassEnrollment.objects.get(student=student, classroom=classroom)
 
-        # Enroll the student
-        enrollment = StudentClassEnrollment.objects.create(
-            student=student, classroom=classroom
-        )
+        # Prime the token authentication cache for the student's first requests
+        enrollment.student = student
+        enrollment.classroom = classroom
+        transaction.on_commit(lambda: auth_cache.remember_enrollment(enrollment))
 
-        # Generate authentication token for the student
+        # Generate authentication token for the student (re-joins get a fresh one too)
         token = StudentToken.generate_token(
             student_id=student.id,
             class_id=classroom.id,
             enrollment_id=enrollment.id
         )
 
+        if created:
+            message = f"Successfully joined class {classroom.course.name} ({classroom.code})"
+        else:
+            message = "You are already enrolled in this class."
+
         return Response(
             {
-                "message": f"Successfully joined class {classroom.course.name} ({classroom.code})",
+                "message": message,
                 "student_id": student.id,
                 "class_id": classroom.id,
                 "enrollment_id": enrollment.id,
@@ -266,10 +424,25 @@ class JoinClassView(APIView):
                 "token_type": "Bearer",
                 "expires_in": 86400,  # 24 hours in seconds
             },
-            status=status.HTTP_201_CREATED,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
         )
 
 
+def conditional_get(request, etag, respond):
+    """
+    Answer a polling GET with 304 Not Modified when the client's ETag is
+    current, otherwise with respond(). Either way the response carries the
+    ETag; it is per student, so it may only be cached privately and must be
+    revalidated. If-Modified-Since is ignored (see quizzes.content_cache).
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = respond()
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 class StudentQuizListView(APIView):
     """
     Allow students to view available quizzes in their class.
@@ -287,35 +460,48 @@ class StudentQuizListView(APIView):
             )
         
         classroom = request.user.classroom
-        
-        # Get standalone quizzes only (exclude multi-quiz questions)
-        quizzes = Quiz.objects.filter(
-            course=classroom.course,
-            multi_question_id__isnull=True  # Only standalone quizzes
-        ).order_by('-created_at')
-        
-        # Serialize quiz data for students (without sensitive info)
-        quiz_data = []
-        for quiz in quizzes:
-            quiz_data.append({
-                'id': quiz.id,
-                'title': quiz.title,
-                'quiz_type': quiz.quiz_type,
-                'properties': quiz.properties,
-                'created_at': quiz.created_at,
-                'show_timer': quiz.show_timer,
-                'auto_close_after_seconds': quiz.auto_close_after_seconds,
+
+        # Validators come from the course's quiz version, so an unchanged list
+        # is answered with a 304 before any quiz is read; class_info is part
+        # of the payload, so its fields are folded in too
+        token = content_cache.course_validators([classroom.course_id])
+        class_tag = zlib.crc32(f'{classroom.code}:{classroom.active}:{classroom.course.name}'.encode())
+        etag = f'"sq-{classroom.id}-{class_tag:x}-{token}"'
+
+        def build():
+            # Standalone quizzes only (exclude multi-quiz questions), serialized
+            # for students (without sensitive info)
+            quizzes = Quiz.objects.filter(
+                course_id=classroom.course_id,
+                multi_question_id__isnull=True
+            ).order_by('-created_at')
+            return [
+                {
+                    'id': quiz.id,
+                    'title': quiz.title,
+                    'quiz_type': quiz.quiz_type,
+                    'properties': quiz.properties,
+                    'created_at': quiz.created_at,
+                    'show_timer': quiz.show_timer,
+                    'auto_close_after_seconds': quiz.auto_close_after_seconds,
+                }
+                for quiz in quizzes
+            ]
+
+        def respond():
+            # Shared by every student of the course until one of its quizzes changes
+            quiz_data = content_cache.course_quiz_list(classroom.course_id, build)
+            return Response({
+                'quizzes': quiz_data,
+                'class_info': {
+                    'id': classroom.id,
+                    'code': classroom.code,
+                    'course_name': classroom.course.name,
+                    'active': classroom.active
+                }
             })
-        
-        return Response({
-            'quizzes': quiz_data,
-            'class_info': {
-                'id': classroom.id,
-                'code': classroom.code,
-                'course_name': classroom.course.name,
-                'active': classroom.active
-            }
-        })
+
+        return conditional_get(request, etag, respond)
 
 
 class StudentMultiQuizListView(APIView):
@@ -326,23 +512,27 @@ class StudentMultiQuizListView(APIView):
         """List all multi-quiz available to the student"""
         # Get student ID from StudentUser
         student_id = request.user.student.id
-        
-        # Get all unique multi_question_ids for quizzes in student's enrolled courses
-        multi_quiz_ids = Quiz.objects.filter(
-            multi_question_id__isnull=False,
-            course__classes__enrollments__student_id=student_id
-        ).values_list('multi_question_id', flat=True).distinct()
-        
-        # Build response with quizzes grouped by multi_question_id
-        result = {}
-        for multi_id in multi_quiz_ids:
-            quizzes = Quiz.objects.filter(multi_question_id=multi_id).order_by('question_order')
-            if quizzes.exists():
-                from quizzes.serializers import QuizSerializer
-                quiz_serializer = QuizSerializer(quizzes, many=True)
-                result[str(multi_id)] = quiz_serializer.data
-        
-        return Response(result)
+        course_ids = list(
+            StudentClassEnrollment.objects.filter(student_id=student_id)
+            .values_list('classroom__course_id', flat=True)
+        )
+
+        # Every quiz change in an enrolled course bumps that course's version
+        token = content_cache.course_validators(course_ids)
+        etag = f'"smq-{token}"'
+
+        def respond():
+            # All multi-quiz questions of the student's enrolled courses, in one ordered query
+            quizzes = Quiz.objects.filter(
+                multi_question_id__isnull=False,
+                course_id__in=course_ids
+            ).order_by('multi_question_id', 'question_order')
+
+            from quizzes.serializers import QuizSerializer
+            from quizzes.views import group_by_multi_question_id
+            return Response(group_by_multi_question_id(QuizSerializer(quizzes, many=True).data))
+
+        return conditional_get(request, etag, respond)
 
 
 class StudentMultiQuizQuestionsView(APIView):
@@ -351,23 +541,35 @@ class StudentMultiQuizQuestionsView(APIView):
     
     def get(self, request, multi_question_id):
         """Get all questions in a specific multi-quiz"""
-        # Get student's enrollments
-        student_id = request.user.student.id
-        enrollments = StudentClassEnrollment.objects.filter(student_id=student_id)
-        enrolled_courses = [e.classroom.course for e in enrollments]
-        
-        # Get questions from this multi-quiz that belong to enrolled courses
-        questions = Quiz.objects.filter(
-            multi_question_id=multi_question_id,
-            course__in=enrolled_courses
-        ).order_by('question_order')
-        
-        if not questions.exists():
+        from quizzes.serializers import QuizSerializer
+
+        # Read the validators before the deck, so a concurrent change can only
+        # pair new content with an old ETag (costing one extra download)
+        token = content_cache.multi_quiz_validators(multi_question_id)
+
+        def build():
+            questions = list(Quiz.objects.filter(multi_question_id=multi_question_id).order_by('question_order'))
+            if not questions:
+                return None
+            return {
+                'course_id': questions[0].course_id,
+                'data': QuizSerializer(questions, many=True).data,
+            }
+
+        # The deck is cached once; access is checked against the student's enrollments,
+        # starting with the class the token was issued for
+        deck = content_cache.multi_quiz_questions(multi_question_id, build)
+        enrolled = deck is not None and (
+            request.user.classroom.course_id == deck['course_id']
+            or StudentClassEnrollment.objects.filter(
+                student_id=request.user.student.id,
+                classroom__course_id=deck['course_id']
+            ).exists()
+        )
+        if not enrolled:
             return Response(
                 {'detail': 'Multi-quiz not found or not available'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        from quizzes.serializers import QuizSerializer
-        serializer = QuizSerializer(questions, many=True)
-        return Response(serializer.data)
+
+        return conditional_get(request, f'"smd-{token}"', lambda: Response(deck['data']))